@@ -1,8 +1,27 @@
+from array import array
+from typing import Iterable, Iterator, List
+from bounded_cache import BoundedCache
+import bisect
+import importlib
+import itertools
 import json
+import mmap
+import os
+import struct
+import sys
+from json.encoder import encode_basestring_ascii
+
+#Interned strings are freed once nothing refers to them, so interning every name does not grow memory without bound
+def intern_name(name):
+    if type(name) == str:
+        return sys.intern(name)
+    return name
 
 class BasicAction:
+    __slots__ = ('name', 'arguments')
+
     def __init__(self, name, arguments):
-        self.name = name
+        self.name = intern_name(name)
         self.arguments = arguments
     
     def compute_talon_script(self):
@@ -32,6 +51,9 @@ class BasicAction:
         return self.arguments
     
     def to_json(self) -> str:
+        if type(self.name) == str and type(self.arguments) in (list, tuple) and all(type(argument) == str for argument in self.arguments):
+            #Nearly every action only has string arguments, which can be escaped directly without going through the general encoder
+            return compute_action_json_prefix(self.name) + ', '.join(map(encode_basestring_ascii, self.arguments)) + ']}'
         return json.dumps({'name': self.name, 'arguments': self.arguments}, cls = BasicActionEncoder)
     
     @staticmethod
@@ -48,6 +70,16 @@ class BasicAction:
     def __str__(self):
         return self.to_json()
 
+_action_names_to_json_prefixes = {}
+
+def compute_action_json_prefix(name: str) -> str:
+    """Returns the start of the json for an action with the name up to its first argument, matching the output of json.dumps"""
+    prefix = _action_names_to_json_prefixes.get(name)
+    if prefix is None:
+        prefix = '{"name": ' + encode_basestring_ascii(name) + ', "arguments": ['
+        _action_names_to_json_prefixes[name] = prefix
+    return prefix
+
 class BasicActionEncoder(json.JSONEncoder):
     def default(self, object):
         if isinstance(object, TalonCapture):
@@ -60,6 +92,8 @@ def compute_talon_script_boolean_value(value: bool):
     return 0
 
 class TalonCapture:
+    __slots__ = ('name', 'instance', 'postfix')
+
     def __init__(self, name: str, instance: int, postfix: str = ''):
         self.name = name
         self.instance = instance
@@ -86,8 +120,10 @@ class TalonCapture:
         return self.name == other.name and self.instance == other.instance and self.postfix == other.postfix
 
 class Command:
+    __slots__ = ('name', 'actions', 'seconds_since_action')
+
     def __init__(self, name: str, actions, seconds_since_action: int = None):
-        self.name = name
+        self.name = intern_name(name)
         self.actions = actions
         self.seconds_since_action = seconds_since_action
     
@@ -104,7 +140,7 @@ class Command:
         return self.actions == other.actions
     
     def set_name(self, name: str) -> None:
-        self.name = name
+        self.name = intern_name(name)
     
     def is_time_information_available(self) -> bool:
         return self.seconds_since_action is not None
@@ -125,6 +161,8 @@ class Command:
         return representation
 
 class CommandChain(Command):
+    __slots__ = ('chain_number', 'chain_size')
+
     def __init__(self, name: str, actions, chain_number: int = 0, chain_size: int = 0):
         super().__init__(name, actions)
         self.chain_number: int = chain_number
@@ -151,93 +189,829 @@ class CommandChain(Command):
         return self.chain_size
 
 class RecordingStart:
+    __slots__ = ()
+
     def is_command_record(self):
         return False
 
+class ValueTable:
+    """Numbers values so that columns can refer to them by index. Equal strings share a single index."""
+    def __init__(self):
+        self.values = []
+        self.string_indices = {}
+
+    def add(self, value) -> int:
+        if type(value) == str:
+            index = self.string_indices.get(value)
+            if index is None:
+                index = len(self.values)
+                self.values.append(value)
+                self.string_indices[value] = index
+            return index
+        self.values.append(value)
+        return len(self.values) - 1
+
+    def get(self, index: int):
+        return self.values[index]
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+INDEX_TYPE_CODE = 'I'
+RECORDING_START_NAME_INDEX = (1 << (8 * array(INDEX_TYPE_CODE).itemsize)) - 1
+NO_SECONDS_SINCE_ACTION = -(1 << 63)
+
+class CommandHistory:
+    """A history of commands and recording starts stored in columns.
+        Command names, action names and arguments are kept once each in value tables and every command refers to them with integer indices,
+        which takes a fraction of the memory of a list of Command objects. Indexing and iterating create new Command objects,
+        so changing them does not change the history.
+    """
+    def __init__(self, records: Iterable = ()):
+        self.command_names = ValueTable()
+        self.action_names = ValueTable()
+        self.arguments = ValueTable()
+        self.command_name_indices = array(INDEX_TYPE_CODE)
+        self.seconds_since_actions = array('q')
+        #The actions of command i are those from action_starts[i] up to action_starts[i + 1], and arguments work the same way for actions
+        self.action_starts = array(INDEX_TYPE_CODE, [0])
+        self.action_name_indices = array(INDEX_TYPE_CODE)
+        self.argument_starts = array(INDEX_TYPE_CODE, [0])
+        self.argument_indices = array(INDEX_TYPE_CODE)
+        self.extend(records)
+
+    def append(self, record):
+        if not record.is_command_record():
+            self.append_recording_start()
+            return
+        self.append_command_values(record.get_name(), [(action.get_name(), action.get_arguments()) for action in record.get_actions()], record.get_seconds_since_action())
+
+    def append_recording_start(self):
+        self.command_name_indices.append(RECORDING_START_NAME_INDEX)
+        self.seconds_since_actions.append(NO_SECONDS_SINCE_ACTION)
+        self.action_starts.append(len(self.action_name_indices))
+
+    def append_command_values(self, name: str, actions, seconds_since_action: int = None):
+        """Appends a command without creating objects for it, where the actions are pairs of action names and arguments"""
+        self.command_name_indices.append(self.command_names.add(name))
+        self.seconds_since_actions.append(NO_SECONDS_SINCE_ACTION if seconds_since_action is None else seconds_since_action)
+        for action_name, arguments in actions:
+            self.action_name_indices.append(self.action_names.add(action_name))
+            for argument in arguments:
+                self.argument_indices.append(self.arguments.add(argument))
+            self.argument_starts.append(len(self.argument_indices))
+        self.action_starts.append(len(self.action_name_indices))
+
+    def extend(self, records: Iterable):
+        for record in records:
+            self.append(record)
+
+    def _create_action(self, action_number: int) -> BasicAction:
+        arguments = [self.arguments.get(argument_index) for argument_index in self.argument_indices[self.argument_starts[action_number]:self.argument_starts[action_number + 1]]]
+        return BasicAction(self.action_names.get(self.action_name_indices[action_number]), arguments)
+
+    def _create_record(self, index: int):
+        name_index = self.command_name_indices[index]
+        if name_index == RECORDING_START_NAME_INDEX:
+            return RecordingStart()
+        actions = [self._create_action(action_number) for action_number in range(self.action_starts[index], self.action_starts[index + 1])]
+        seconds_since_action = self.seconds_since_actions[index]
+        if seconds_since_action == NO_SECONDS_SINCE_ACTION:
+            seconds_since_action = None
+        return Command(self.command_names.get(name_index), actions, seconds_since_action)
+
+    def __len__(self) -> int:
+        return len(self.command_name_indices)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return CommandHistory(self._create_record(i) for i in range(*index.indices(len(self))))
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError('command history index out of range')
+        return self._create_record(index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self._create_record(index)
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        return f'CommandHistory({len(self)} records)'
+
 COMMAND_NAME_PREFIX = 'Command: '
 RECORDING_START_MESSAGE = 'START'
 TIME_DIFFERENCE_PREFIX = 'T'
 
+GZIP_COMPRESSION = 'gzip'
+BZ2_COMPRESSION = 'bz2'
+LZMA_COMPRESSION = 'lzma'
+NO_COMPRESSION = 'none'
+#The compression modules are only imported when a compressed record is opened, which keeps them out of startup
+COMPRESSION_MODULE_NAMES = {GZIP_COMPRESSION: 'gzip', BZ2_COMPRESSION: 'bz2', LZMA_COMPRESSION: 'lzma'}
+COMPRESSION_FORMATS = list(COMPRESSION_MODULE_NAMES) + [NO_COMPRESSION]
+COMPRESSION_EXTENSIONS = {'.gz': GZIP_COMPRESSION, '.bz2': BZ2_COMPRESSION, '.xz': LZMA_COMPRESSION, '.lzma': LZMA_COMPRESSION}
+
+def find_record_compression(path: str, compression: str = None) -> str:
+    """Returns the compression of the record file, which comes from its extension unless one is given, or None if it is not compressed"""
+    if compression is None:
+        compression = COMPRESSION_EXTENSIONS.get(os.path.splitext(path)[1].lower(), NO_COMPRESSION)
+    if compression == NO_COMPRESSION:
+        return None
+    if compression not in COMPRESSION_MODULE_NAMES:
+        raise ValueError(f'Unknown record compression {compression}')
+    return compression
+
+def open_record_file(path: str, mode: str, compression: str = None):
+    """Opens the record file with the compression found by find_record_compression, decompressing or compressing it as it is streamed.
+        In text mode records are always UTF-8 with new lines left as they are, which is what the readers and the record index expect.
+    """
+    compression = find_record_compression(path, compression)
+    if compression is None:
+        if 'b' in mode:
+            return open(path, mode)
+        return open(path, mode, encoding='utf-8', newline='\n')
+    compression_module = importlib.import_module(COMPRESSION_MODULE_NAMES[compression])
+    if 'b' in mode:
+        return compression_module.open(path, mode)
+    return compression_module.open(path, mode + 't' if 't' not in mode else mode, encoding='utf-8', newline='\n')
+
+RECORD_READING_BLOCK_SIZE = 1 << 20
+#Action lines repeat constantly in records, so the parsed forms of recent ones are remembered with a table of bounded size
+MAXIMUM_NUMBER_OF_REMEMBERED_ACTION_LINES = 1 << 16
+_parsed_action_lines = BoundedCache(MAXIMUM_NUMBER_OF_REMEMBERED_ACTION_LINES)
+
+def compute_action_from_line(line: str) -> BasicAction:
+    parsed_action = _parsed_action_lines.get(line)
+    if parsed_action is None:
+        representation = json.loads(line)
+        name, arguments = representation['name'], representation['arguments']
+        #Only actions whose arguments cannot be changed in place are remembered, since every action gets its own copy of the arguments list
+        if type(arguments) != list or not all(argument is None or type(argument) in (str, int, float, bool) for argument in arguments):
+            return BasicAction(name, arguments)
+        parsed_action = (intern_name(name), arguments)
+        _parsed_action_lines.remember(line, parsed_action)
+    name, arguments = parsed_action
+    return BasicAction(name, arguments[:])
+
+def _remove_new_lines(lines: List[str], should_strip_lines: bool) -> Iterator[str]:
+    #Splitting leaves an empty line after the new line that ends the block, which does not exist in the file
+    if not lines[-1]:
+        lines.pop()
+    if should_strip_lines:
+        return map(str.strip, lines)
+    return iter(lines)
+
+def _generate_compressed_record_file_lines(path: str, compression: str, should_strip_lines: bool) -> Iterator[str]:
+    with open_record_file(path, 'rb', compression) as file:
+        unfinished_line = b''
+        block = file.read(RECORD_READING_BLOCK_SIZE)
+        while block:
+            block = unfinished_line + block
+            #Only the part up to the last new line is decoded so that no line or multibyte character gets split between blocks
+            new_line_index = block.rfind(b'\n')
+            unfinished_line = block[new_line_index + 1:]
+            if new_line_index != -1:
+                yield from _remove_new_lines(block[:new_line_index + 1].decode('utf-8').split('\n'), should_strip_lines)
+            block = file.read(RECORD_READING_BLOCK_SIZE)
+        if unfinished_line:
+            yield from _remove_new_lines([unfinished_line.decode('utf-8')], should_strip_lines)
+
+def generate_record_file_lines(path: str, starting_byte: int = 0, ending_byte: int = None, should_strip_lines: bool = True, compression: str = None) -> Iterator[str]:
+    """Memory maps the record file and yields its lines without new lines, decoding and splitting large blocks at once.
+        Surrounding whitespace is also removed unless should_strip_lines is False. Only the lines in the byte range are yielded when one is given,
+        which must start and end at the start of a line or the end of the file. Compressed records are decompressed a block at a time instead
+        and cannot be read by byte range.
+    """
+    compression = find_record_compression(path, compression)
+    if compression is not None:
+        if starting_byte != 0 or ending_byte is not None:
+            raise ValueError('Compressed records cannot be read by byte range')
+        yield from _generate_compressed_record_file_lines(path, compression, should_strip_lines)
+        return
+    with open(path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as record:
+            if ending_byte is None:
+                ending_byte = len(record)
+            block_start = starting_byte
+            while block_start < ending_byte:
+                block_end = block_start + RECORD_READING_BLOCK_SIZE
+                if block_end < ending_byte:
+                    #Blocks end right after a new line so that no line or multibyte character gets split between blocks
+                    new_line_index = record.rfind(b'\n', block_start, block_end)
+                    if new_line_index == -1:
+                        new_line_index = record.find(b'\n', block_end, ending_byte)
+                    block_end = ending_byte if new_line_index == -1 else new_line_index + 1
+                else:
+                    block_end = ending_byte
+                yield from _remove_new_lines(record[block_start:block_end].decode('utf-8').split('\n'), should_strip_lines)
+                block_start = block_end
+
+def generate_records_from_lines(lines: Iterable[str], seconds_since_last_action_for_next_command: int = None) -> Iterator:
+    """Yields the commands and recording starts described by the record lines.
+        A time difference line applies to the command that starts after it. The seconds since the last action for the next command
+        is the time difference carried over from before the lines, which only matters when they start with a command start.
+    """
+    command_name = ''
+    command_actions = []
+    seconds_since_last_action = None
+    time_information_found_after_command = seconds_since_last_action_for_next_command is not None
+    for line in lines:
+        first_character = line[:1]
+        if first_character == '{':
+            command_actions.append(compute_action_from_line(line))
+            continue
+        if first_character == 'T':
+            seconds_since_last_action = seconds_since_last_action_for_next_command
+            seconds_since_last_action_for_next_command = compute_seconds_since_last_action(line)
+            time_information_found_after_command = True
+            continue
+        is_command_start = line.startswith(COMMAND_NAME_PREFIX)
+        is_recording_start = not is_command_start and line == RECORDING_START_MESSAGE
+        if not is_command_start and not is_recording_start:
+            continue
+        if command_actions:
+            yield Command(command_name, command_actions, seconds_since_last_action if time_information_found_after_command else seconds_since_last_action_for_next_command)
+        if is_command_start:
+            command_name = compute_command_name_without_prefix(line)
+        else:
+            yield RecordingStart()
+            command_name = ''
+        command_actions = []
+        seconds_since_last_action = None
+        if not time_information_found_after_command:
+            seconds_since_last_action_for_next_command = None
+        time_information_found_after_command = False
+    if command_actions:
+        yield Command(command_name, command_actions, seconds_since_last_action if time_information_found_after_command else seconds_since_last_action_for_next_command)
+
+def iter_file_record(path: str, compression: str = None) -> Iterator:
+    """Lazily yields the commands and recording starts in the specified record file one at a time"""
+    return generate_records_from_lines(generate_record_file_lines(path, compression=compression))
+
 class RecordParser:
-    def __init__(self, path: str):
-        self.commands = []
-        self.current_command_name = ''
-        self.current_command_actions = []
-        self.seconds_since_last_action = None
-        self.seconds_since_last_action_for_next_command = None
-        self.time_information_found_after_command = False
+    def __init__(self, path: str, commands = None, compression: str = None):
+        """Parses the record file at the path into the commands container, which is a new list if none is given"""
+        if commands is None:
+            commands = []
+        self.commands = commands
+        self.compression = compression
         self.parse_path(path)
 
     def parse_path(self, path: str):
-        self.process_file_lines(path)
-        if self.is_command_found():
-            self.add_current_command() 
-    
-    def process_file_lines(self, path: str):
-        with open(path, 'r') as file:
-            line = file.readline()
-            while line:
-                line_without_trailing_newline = line.strip()
-                self.process_line(line_without_trailing_newline)
-                line = file.readline()
-
-    def process_line(self, line: str):
-        if is_action(line):
-            self.add_action_based_on_line(line)
-        elif is_line_command_start(line):
-            self.process_command_start(line)
-        elif is_line_time_deference(line):
-            self.process_time_difference(line)
-        elif is_line_recording_start(line):
-            self.process_recording_start()
-        if is_line_command_ending(line):
-            self.reset_command_information_except_name()
-     
-    def add_action_based_on_line(self, line_without_trailing_newline: str):
-        self.current_command_actions.append(BasicAction.from_json(line_without_trailing_newline))
-
-    def process_command_start(self, line_without_trailing_newline: str):
-        self.add_current_command_if_available()
-        self.current_command_name = compute_command_name_without_prefix(line_without_trailing_newline)
-
-    def add_current_command_if_available(self):
-        if self.is_command_found():
-            self.add_current_command()
-
-    def is_command_found(self):
-        return len(self.current_command_actions) > 0
-
-    def add_current_command(self):
-        seconds_since_last_action = self.seconds_since_last_action
-        if not self.time_information_found_after_command:
-            seconds_since_last_action = self.seconds_since_last_action_for_next_command
-        self.commands.append(Command(self.current_command_name, self.current_command_actions[:], seconds_since_last_action))
-
-    def process_time_difference(self, line_without_trailing_newline):
-        self.seconds_since_last_action = self.seconds_since_last_action_for_next_command
-        self.seconds_since_last_action_for_next_command = compute_seconds_since_last_action(line_without_trailing_newline)
-        self.time_information_found_after_command = True
-
-    def process_recording_start(self):
-        self.add_current_command_if_available()
-        self.commands.append(RecordingStart())
-        self.current_command_name = ''
-
-    def reset_command_information_except_name(self):
-        self.current_command_actions = []
-        self.seconds_since_last_action = None
-        if not self.time_information_found_after_command:
-            self.seconds_since_last_action_for_next_command = None
-        self.time_information_found_after_command = False
+        self.commands.extend(iter_file_record(path, self.compression))
 
     def get_record(self):
         return self.commands
 
-def read_file_record(path: str):
-    '''Obtains a list of the basic actions performed by the commands in the specified record file'''
-    parser = RecordParser(path)
+def read_file_record(path: str, commands = None, compression: str = None):
+    '''Obtains a list of the basic actions performed by the commands in the specified record file.
+    Passing a CommandHistory as the commands stores the record in columns instead.
+    Use iter_file_record to go through large records without keeping them in memory.
+    Records compressed with gzip, bz2 or lzma are decompressed while they are read.'''
+    parser = RecordParser(path, commands, compression)
     return parser.get_record()
 
+def find_seconds_since_last_action_carried_to(record, line_start: int) -> int:
+    """Returns the time difference that the parser carries over to the command starting at the line start in the record bytes.
+        That is the last time difference since the command ending line before it, or None if there is no such time difference.
+    """
+    ending_index = line_start - 1
+    while ending_index > 0:
+        starting_index = record.rfind(b'\n', 0, ending_index) + 1
+        line = record[starting_index:ending_index].decode('utf-8').strip()
+        if line.startswith(COMMAND_NAME_PREFIX) or line == RECORDING_START_MESSAGE:
+            return None
+        if line[:1] == 'T':
+            return compute_seconds_since_last_action(line)
+        ending_index = starting_index - 1
+    return None
+
+COMMAND_START_LINE_BYTES = ('\n' + COMMAND_NAME_PREFIX).encode('utf-8')
+
+def find_command_start_line(record, starting_index: int) -> int:
+    """Returns the index of the new line before the first line after the starting index that the parser treats as a command start, or -1 if there is none.
+        Lines are stripped before they are parsed, so a line like 'Command: ' that strips to 'Command:' does not start a command.
+    """
+    while True:
+        new_line_index = record.find(COMMAND_START_LINE_BYTES, starting_index)
+        if new_line_index == -1:
+            return -1
+        line_ending_index = record.find(b'\n', new_line_index + 1)
+        if line_ending_index == -1:
+            line_ending_index = len(record)
+        if record[new_line_index + 1:line_ending_index].decode('utf-8').strip().startswith(COMMAND_NAME_PREFIX):
+            return new_line_index
+        starting_index = new_line_index + 1
+
+def split_record_file_into_ranges(path: str, number_of_ranges: int) -> list:
+    """Splits the record file into about the given number of byte ranges that each start with a command start line.
+        Returns the starting byte, ending byte and the time difference carried over into every range.
+    """
+    with open(path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return []
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as record:
+            ranges = []
+            target_range_size = max(1, len(record) // max(1, number_of_ranges))
+            starting_byte = 0
+            seconds_since_last_action_carried = None
+            while starting_byte < len(record):
+                command_start_index = find_command_start_line(record, starting_byte + target_range_size - 1)
+                ending_byte = len(record) if command_start_index == -1 else command_start_index + 1
+                ranges.append((starting_byte, ending_byte, seconds_since_last_action_carried))
+                if ending_byte < len(record):
+                    seconds_since_last_action_carried = find_seconds_since_last_action_carried_to(record, ending_byte)
+                starting_byte = ending_byte
+            return ranges
+
+def _read_record_file_range(path: str, starting_byte: int, ending_byte: int, seconds_since_last_action_carried: int) -> list:
+    return list(generate_records_from_lines(generate_record_file_lines(path, starting_byte, ending_byte), seconds_since_last_action_carried))
+
+#More ranges than processes keeps every process busy when some ranges take longer than others
+NUMBER_OF_RECORD_RANGES_PER_PROCESS = 4
+
+def read_file_record_in_parallel(path: str, number_of_processes: int, commands = None):
+    """Reads the record file like read_file_record with the work split between processes.
+        Every process parses ranges of the file that start with a command, and the time difference carried over
+        from before each range is found ahead of time so that the result is the same as reading the file in order.
+    """
+    if commands is None:
+        commands = []
+    #Compressed records can only be read from the start
+    if number_of_processes <= 1 or find_record_compression(path) is not None:
+        return read_file_record(path, commands)
+    ranges = split_record_file_into_ranges(path, number_of_processes*NUMBER_OF_RECORD_RANGES_PER_PROCESS)
+    if len(ranges) <= 1:
+        return read_file_record(path, commands)
+    starting_bytes, ending_bytes, carried_times = zip(*ranges)
+    #Importing the process pool is slow, so only reading in parallel pays for it
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(min(number_of_processes, len(ranges))) as executor:
+        for records in executor.map(_read_record_file_range, itertools.repeat(path), starting_bytes, ending_bytes, carried_times):
+            commands.extend(records)
+    return commands
+
+RECORD_INDEX_EXTENSION = '.offsets'
+RECORD_INDEX_MAGIC = b'CRIX'
+RECORD_INDEX_FORMAT_VERSION = 1
+RECORD_INDEX_HEADER = struct.Struct('<4sIQQQ')
+OFFSET_TYPE_CODE = 'Q'
+
+def compute_record_index_path(record_path: str) -> str:
+    return record_path + RECORD_INDEX_EXTENSION
+
+def _write_offsets(offsets: array, file):
+    if sys.byteorder != 'little':
+        offsets = array(OFFSET_TYPE_CODE, offsets)
+        offsets.byteswap()
+    offsets.tofile(file)
+
+def _read_offsets(file, number_of_offsets: int) -> array:
+    offsets = array(OFFSET_TYPE_CODE)
+    offsets.fromfile(file, number_of_offsets)
+    if sys.byteorder != 'little':
+        offsets.byteswap()
+    return offsets
+
+class RecordIndex:
+    """The byte offsets of the commands and recording starts in a record file, which allow reading any part of the record without parsing what comes before it.
+        The offset of a command is the start of the line that makes the parser begin it, which is its command start line unless it has no name.
+    """
+    def __init__(self, record_size: int = 0):
+        self.record_size = record_size
+        self.command_offsets = array(OFFSET_TYPE_CODE)
+        self.recording_start_offsets = array(OFFSET_TYPE_CODE)
+
+    def add_command(self, offset: int):
+        self.command_offsets.append(offset)
+
+    def add_recording_start(self, offset: int):
+        self.recording_start_offsets.append(offset)
+
+    def get_number_of_commands(self) -> int:
+        return len(self.command_offsets)
+
+    def get_number_of_recording_starts(self) -> int:
+        return len(self.recording_start_offsets)
+
+    def get_number_of_recording_segments(self) -> int:
+        return len(self.recording_start_offsets) + 1
+
+    def get_command_offset(self, command_number: int) -> int:
+        if command_number == len(self.command_offsets):
+            return self.record_size
+        return self.command_offsets[command_number]
+
+    def get_recording_segment_offsets(self, segment_number: int):
+        """Returns the byte range of the segment, where segment 0 comes before the first recording start and segment k starts with recording start k"""
+        if segment_number < 0 or segment_number > len(self.recording_start_offsets):
+            raise IndexError('recording segment number out of range')
+        starting_byte = 0 if segment_number == 0 else self.recording_start_offsets[segment_number - 1]
+        ending_byte = self.record_size if segment_number == len(self.recording_start_offsets) else self.recording_start_offsets[segment_number]
+        return starting_byte, ending_byte
+
+    def is_recording_start_offset(self, offset: int) -> bool:
+        position = bisect.bisect_left(self.recording_start_offsets, offset)
+        return position < len(self.recording_start_offsets) and self.recording_start_offsets[position] == offset
+
+    def save(self, path: str):
+        with open(path, 'wb') as file:
+            file.write(RECORD_INDEX_HEADER.pack(RECORD_INDEX_MAGIC, RECORD_INDEX_FORMAT_VERSION, self.record_size, len(self.command_offsets), len(self.recording_start_offsets)))
+            _write_offsets(self.command_offsets, file)
+            _write_offsets(self.recording_start_offsets, file)
+
+    @staticmethod
+    def load(path: str, record_size: int = None):
+        """Returns the index at the path or None if there is none or it was made for a record of a different size"""
+        try:
+            with open(path, 'rb') as file:
+                magic, format_version, indexed_record_size, number_of_commands, number_of_recording_starts = RECORD_INDEX_HEADER.unpack(file.read(RECORD_INDEX_HEADER.size))
+                if magic != RECORD_INDEX_MAGIC or format_version != RECORD_INDEX_FORMAT_VERSION or (record_size is not None and indexed_record_size != record_size):
+                    return None
+                index = RecordIndex(indexed_record_size)
+                index.command_offsets = _read_offsets(file, number_of_commands)
+                index.recording_start_offsets = _read_offsets(file, number_of_recording_starts)
+        except (OSError, struct.error, EOFError):
+            return None
+        return index
+
+def create_record_index(path: str) -> RecordIndex:
+    """Finds the offsets of the commands and recording starts in the record file with the same rules as the parser"""
+    if find_record_compression(path) is not None:
+        raise ValueError('Compressed records cannot be indexed because they cannot be read by byte range')
+    index = RecordIndex(os.path.getsize(path))
+    command_offset = 0
+    is_command_found = False
+    line_offset = 0
+    for line in generate_record_file_lines(path, should_strip_lines=False):
+        stripped_line = line.strip()
+        if stripped_line[:1] == '{':
+            is_command_found = True
+        elif stripped_line.startswith(COMMAND_NAME_PREFIX) or stripped_line == RECORDING_START_MESSAGE:
+            if is_command_found:
+                index.add_command(command_offset)
+            if stripped_line == RECORDING_START_MESSAGE:
+                index.add_recording_start(line_offset)
+            command_offset = line_offset
+            is_command_found = False
+        line_offset += (len(line) if line.isascii() else len(line.encode('utf-8'))) + 1
+    if is_command_found:
+        index.add_command(command_offset)
+    return index
+
+def get_record_index(path: str) -> RecordIndex:
+    """Returns the index saved next to the record file if it is still up to date and otherwise creates one"""
+    index = RecordIndex.load(compute_record_index_path(path), os.path.getsize(path))
+    if index is None:
+        index = create_record_index(path)
+    return index
+
+def write_record_index(path: str) -> RecordIndex:
+    index = create_record_index(path)
+    index.save(compute_record_index_path(path))
+    return index
+
+def read_record_byte_range(path: str, starting_byte: int, ending_byte: int) -> list:
+    """Parses the records in the byte range, which must start at the start of the file, a command start line or a recording start line"""
+    if starting_byte >= ending_byte:
+        return []
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as record:
+        seconds_since_last_action_carried = find_seconds_since_last_action_carried_to(record, starting_byte)
+    return _read_record_file_range(path, starting_byte, ending_byte, seconds_since_last_action_carried)
+
+def read_file_record_range(path: str, starting_command_number: int, ending_command_number: int, index: RecordIndex = None) -> list:
+    """Returns the records read_file_record returns from the starting command up to the ending command, including the recording starts in between.
+        The command numbers work like list slice bounds.
+    """
+    if index is None:
+        index = get_record_index(path)
+    starting_command_number, ending_command_number, _ = slice(starting_command_number, ending_command_number).indices(index.get_number_of_commands())
+    if starting_command_number >= ending_command_number:
+        return []
+    starting_byte = index.get_command_offset(starting_command_number)
+    ending_byte = index.get_command_offset(ending_command_number)
+    records = read_record_byte_range(path, starting_byte, ending_byte)
+    #A command without a name starts at the recording start before it, which belongs to the range before the command
+    if index.is_recording_start_offset(starting_byte):
+        del records[0]
+    if ending_command_number < index.get_number_of_commands() and index.is_recording_start_offset(ending_byte):
+        records.append(RecordingStart())
+    return records
+
+def read_recording_segment(path: str, segment_number: int, index: RecordIndex = None) -> list:
+    """Returns the records between recording start segment_number and the next one, where segment 0 is the part of the record before the first recording start"""
+    if index is None:
+        index = get_record_index(path)
+    starting_byte, ending_byte = index.get_recording_segment_offsets(segment_number)
+    records = read_record_byte_range(path, starting_byte, ending_byte)
+    if segment_number > 0:
+        del records[0]
+    return records
+
+BINARY_RECORD_MAGIC = b'CRBR'
+BINARY_RECORD_FORMAT_VERSION = 1
+COMMAND_RECORD_TYPE = 0
+RECORDING_START_RECORD_TYPE = 1
+#Every argument starts with one of these tags saying how the rest of it is encoded
+STRING_ARGUMENT_TAG = 0
+INTEGER_ARGUMENT_TAG = 1
+FLOAT_ARGUMENT_TAG = 2
+TRUE_ARGUMENT_TAG = 3
+FALSE_ARGUMENT_TAG = 4
+NONE_ARGUMENT_TAG = 5
+CAPTURE_ARGUMENT_TAG = 6
+JSON_ARGUMENT_TAG = 7
+FLOAT_ARGUMENT_FORMAT = struct.Struct('<d')
+#Decoded commands are remembered by their bytes with a table of bounded size, since the same commands repeat constantly
+MAXIMUM_NUMBER_OF_REMEMBERED_BINARY_COMMANDS = 1 << 16
+
+def is_binary_record_file(path: str, compression: str = None) -> bool:
+    with open_record_file(path, 'rb', compression) as file:
+        return file.read(len(BINARY_RECORD_MAGIC)) == BINARY_RECORD_MAGIC
+
+def decode_varint(data, position: int):
+    """Returns the unsigned integer stored with 7 bits per byte starting at the position and the position after it"""
+    byte = data[position]
+    position += 1
+    if byte < 0x80:
+        return byte, position
+    value = byte & 0x7F
+    shift = 7
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
+
+def decode_zigzag(value: int) -> int:
+    return (value >> 1) if value & 1 == 0 else -((value + 1) >> 1)
+
+def encode_varint(value: int, buffer: bytearray):
+    while value >= 0x80:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+def encode_zigzag(value: int) -> int:
+    """Maps signed integers to unsigned ones so that numbers close to 0 take few bytes as varints"""
+    return value << 1 if value >= 0 else ((-value) << 1) - 1
+
+class BinaryRecordEncoder:
+    """Encodes records in the binary record format. The first time a command or action name is encoded it is stored in full
+        and later records refer to it by its number, so the records have to be written in the order they are encoded.
+    """
+    def __init__(self):
+        self.name_references = {}
+
+    def create_header(self) -> bytes:
+        header = bytearray(BINARY_RECORD_MAGIC)
+        encode_varint(BINARY_RECORD_FORMAT_VERSION, header)
+        return bytes(header)
+
+    def _encode_string(self, text: str, buffer: bytearray):
+        encoded_text = text.encode('utf-8')
+        encode_varint(len(encoded_text), buffer)
+        buffer += encoded_text
+
+    def _encode_name(self, name: str, buffer: bytearray):
+        reference = self.name_references.get(name)
+        if reference is not None:
+            encode_varint(reference, buffer)
+            return
+        buffer.append(0)
+        self._encode_string(name, buffer)
+        self.name_references[name] = len(self.name_references) + 1
+
+    def _encode_argument(self, argument, buffer: bytearray):
+        argument_type = type(argument)
+        if argument_type == str:
+            buffer.append(STRING_ARGUMENT_TAG)
+            self._encode_string(argument, buffer)
+        elif argument_type == bool:
+            buffer.append(TRUE_ARGUMENT_TAG if argument else FALSE_ARGUMENT_TAG)
+        elif argument_type == int:
+            buffer.append(INTEGER_ARGUMENT_TAG)
+            encode_varint(encode_zigzag(argument), buffer)
+        elif argument_type == float:
+            buffer.append(FLOAT_ARGUMENT_TAG)
+            buffer += FLOAT_ARGUMENT_FORMAT.pack(argument)
+        elif argument is None:
+            buffer.append(NONE_ARGUMENT_TAG)
+        elif argument_type == TalonCapture:
+            buffer.append(CAPTURE_ARGUMENT_TAG)
+            self._encode_string(argument.name, buffer)
+            encode_varint(encode_zigzag(argument.instance), buffer)
+            self._encode_string(argument.postfix, buffer)
+        else:
+            buffer.append(JSON_ARGUMENT_TAG)
+            self._encode_string(json.dumps(argument, cls = BasicActionEncoder), buffer)
+
+    def encode_record(self, record) -> bytes:
+        """Returns the record with its length in front of it"""
+        if not record.is_command_record():
+            return bytes((1, RECORDING_START_RECORD_TYPE))
+        payload = bytearray((COMMAND_RECORD_TYPE,))
+        seconds_since_action = record.get_seconds_since_action()
+        encode_varint(0 if seconds_since_action is None else encode_zigzag(seconds_since_action) + 1, payload)
+        self._encode_name(record.get_name(), payload)
+        actions = record.get_actions()
+        encode_varint(len(actions), payload)
+        for action in actions:
+            self._encode_name(action.get_name(), payload)
+            arguments = action.get_arguments()
+            encode_varint(len(arguments), payload)
+            for argument in arguments:
+                self._encode_argument(argument, payload)
+        encoded_record = bytearray()
+        encode_varint(len(payload), encoded_record)
+        encoded_record += payload
+        return bytes(encoded_record)
+
+class BinaryRecordDecoder:
+    """Decodes the records of a binary record file. Names are stored once and referred to by their number after that,
+        so a decoder has to see every record in order.
+    """
+    def __init__(self):
+        self.names = []
+        self.decoded_commands = BoundedCache(MAXIMUM_NUMBER_OF_REMEMBERED_BINARY_COMMANDS)
+
+    def _decode_string(self, data, position: int):
+        length, position = decode_varint(data, position)
+        return data[position:position + length].decode('utf-8'), position + length
+
+    def _decode_name(self, data, position: int):
+        reference, position = decode_varint(data, position)
+        if reference:
+            return self.names[reference - 1], position
+        name, position = self._decode_string(data, position)
+        name = intern_name(name)
+        self.names.append(name)
+        return name, position
+
+    def _decode_argument(self, data, position: int):
+        tag = data[position]
+        position += 1
+        if tag == STRING_ARGUMENT_TAG:
+            return self._decode_string(data, position)
+        if tag == INTEGER_ARGUMENT_TAG:
+            value, position = decode_varint(data, position)
+            return decode_zigzag(value), position
+        if tag == FLOAT_ARGUMENT_TAG:
+            return FLOAT_ARGUMENT_FORMAT.unpack_from(data, position)[0], position + FLOAT_ARGUMENT_FORMAT.size
+        if tag == TRUE_ARGUMENT_TAG:
+            return True, position
+        if tag == FALSE_ARGUMENT_TAG:
+            return False, position
+        if tag == NONE_ARGUMENT_TAG:
+            return None, position
+        if tag == CAPTURE_ARGUMENT_TAG:
+            name, position = self._decode_string(data, position)
+            instance, position = decode_varint(data, position)
+            postfix, position = self._decode_string(data, position)
+            return TalonCapture(name, decode_zigzag(instance), postfix), position
+        if tag == JSON_ARGUMENT_TAG:
+            text, position = self._decode_string(data, position)
+            return json.loads(text), position
+        raise ValueError(f'Unknown argument tag {tag} in binary record')
+
+    def _decode_command_body(self, data, position: int, ending_position: int):
+        """Returns the command name and the action names with their arguments, along with whether the arguments can be shared between commands"""
+        name, position = self._decode_name(data, position)
+        number_of_actions, position = decode_varint(data, position)
+        actions = []
+        can_share_arguments = True
+        for _ in range(number_of_actions):
+            action_name, position = self._decode_name(data, position)
+            number_of_arguments, position = decode_varint(data, position)
+            arguments = []
+            for _ in range(number_of_arguments):
+                argument, position = self._decode_argument(data, position)
+                arguments.append(argument)
+                if type(argument) in (TalonCapture, dict, list):
+                    can_share_arguments = False
+            actions.append((action_name, arguments))
+        if position != ending_position:
+            raise ValueError('Binary command record has the wrong length')
+        return name, actions, can_share_arguments
+
+    def decode_command_body(self, body: bytes):
+        """Returns the command name and its action names with their arguments, which are shared with other commands when the last value is True"""
+        decoded_command = self.decoded_commands.get(body)
+        if decoded_command is not None:
+            return decoded_command
+        name, actions, can_share_arguments = self._decode_command_body(body, 0, len(body))
+        decoded_command = (name, actions, can_share_arguments)
+        if can_share_arguments:
+            self.decoded_commands.remember(body, decoded_command)
+        return decoded_command
+
+def _read_binary_record_header(path: str, record) -> int:
+    """Checks the start of the binary record and returns the position of the first record after it"""
+    if len(record) <= len(BINARY_RECORD_MAGIC) or record[:len(BINARY_RECORD_MAGIC)] != BINARY_RECORD_MAGIC:
+        raise ValueError(f'{path} is not a binary record file')
+    format_version, position = decode_varint(record, len(BINARY_RECORD_MAGIC))
+    if format_version != BINARY_RECORD_FORMAT_VERSION:
+        raise ValueError(f'{path} has unsupported binary record format version {format_version}')
+    return position
+
+def _decode_binary_records(path: str, record, position: int, decode_command_body, is_last_block: bool):
+    """Yields the values for the records in the block from the position on and returns the position of the first record that does not fit in it"""
+    record_size = len(record)
+    #Lengths, record types and times nearly always fit in a single byte, so that case is handled here without decode_varint
+    while position < record_size:
+        length = record[position]
+        if length < 0x80:
+            length_ending_position = position + 1
+        else:
+            try:
+                length, length_ending_position = decode_varint(record, position)
+            except IndexError:
+                length_ending_position = record_size + 1
+        ending_position = length_ending_position + length
+        if ending_position > record_size:
+            if is_last_block:
+                raise ValueError(f'{path} ends in the middle of a record')
+            return position
+        record_type = record[length_ending_position]
+        if record_type == RECORDING_START_RECORD_TYPE:
+            yield None
+        elif record_type == COMMAND_RECORD_TYPE:
+            seconds_since_action = record[length_ending_position + 1]
+            if seconds_since_action < 0x80:
+                body_position = length_ending_position + 2
+            else:
+                seconds_since_action, body_position = decode_varint(record, length_ending_position + 1)
+            seconds_since_action = decode_zigzag(seconds_since_action - 1) if seconds_since_action else None
+            name, actions, are_arguments_shared = decode_command_body(record[body_position:ending_position])
+            yield name, actions, seconds_since_action, are_arguments_shared
+        else:
+            raise ValueError(f'Unknown record type {record_type} in binary record')
+        position = ending_position
+    return position
+
+def generate_binary_record_values(path: str, compression: str = None) -> Iterator:
+    """Yields None for every recording start in the binary record file and the name, action names with arguments,
+        seconds since the last action and whether the arguments are shared for every command.
+        Compressed records are decompressed a block at a time.
+    """
+    decode_command_body = BinaryRecordDecoder().decode_command_body
+    compression = find_record_compression(path, compression)
+    if compression is None:
+        with open(path, 'rb') as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                raise ValueError(f'{path} is not a binary record file')
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as record:
+                position = _read_binary_record_header(path, record)
+                yield from _decode_binary_records(path, record, position, decode_command_body, True)
+        return
+    with open_record_file(path, 'rb', compression) as file:
+        block = file.read(RECORD_READING_BLOCK_SIZE)
+        position = _read_binary_record_header(path, block)
+        while True:
+            next_block = file.read(RECORD_READING_BLOCK_SIZE)
+            position = yield from _decode_binary_records(path, block, position, decode_command_body, not next_block)
+            if not next_block:
+                return
+            #The record that did not fit in the block gets finished with the next one
+            block = block[position:] + next_block
+            position = 0
+
+def iter_binary_file_record(path: str, compression: str = None) -> Iterator:
+    """Lazily yields the commands and recording starts in the specified binary record file one at a time"""
+    for values in generate_binary_record_values(path, compression):
+        if values is None:
+            yield RecordingStart()
+            continue
+        name, actions, seconds_since_action, are_arguments_shared = values
+        if are_arguments_shared:
+            yield Command(name, [BasicAction(action_name, arguments[:]) for action_name, arguments in actions], seconds_since_action)
+        else:
+            yield Command(name, [BasicAction(action_name, arguments) for action_name, arguments in actions], seconds_since_action)
+
+def read_binary_file_record(path: str, commands = None, compression: str = None):
+    '''Obtains the records in the specified binary record file like read_file_record does for text records.
+    A CommandHistory gets the decoded values directly without creating objects for every record.
+    Captures in arguments come back as TalonCapture objects, while a text record only keeps the json string of their name and instance.'''
+    if commands is None:
+        commands = []
+    if type(commands) != CommandHistory:
+        commands.extend(iter_binary_file_record(path, compression))
+        return commands
+    for values in generate_binary_record_values(path, compression):
+        if values is None:
+            commands.append_recording_start()
+        else:
+            commands.append_command_values(*values[:3])
+    return commands
+
 def compute_command_name_without_prefix(command_name: str):
     return command_name[len(COMMAND_NAME_PREFIX):]
 
@@ -0,0 +1,274 @@
+"""Rough timings for the performance sensitive parts of the generator. Run with: python benchmarks.py benchmark_name"""
+from typing import Callable
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+def compute_best_time(function: Callable[[], None], repetitions: int = 3) -> float:
+    best_time = None
+    for _ in range(repetitions):
+        start = time.perf_counter()
+        function()
+        elapsed_time = time.perf_counter() - start
+        if best_time is None or elapsed_time < best_time:
+            best_time = elapsed_time
+    return best_time
+
+def print_timing(description: str, seconds: float):
+    print(f"{description}: {seconds * 1000:.1f} ms")
+
+def benchmark_lexicon_loading():
+    from lexicon import load_words_from_text, create_lexicon_from_words, compile_lexicon_artifact, load_lexicon_artifact
+    def load_from_text():
+        create_lexicon_from_words(load_words_from_text())
+    with tempfile.TemporaryDirectory() as directory:
+        artifact_path = os.path.join(directory, 'words.lexicon')
+        print_timing("Compiling the artifact", compute_best_time(lambda: compile_lexicon_artifact(artifact_path=artifact_path), 1))
+        print_timing("Building the lexicon from words.txt", compute_best_time(load_from_text))
+        print_timing("Loading the compiled artifact", compute_best_time(lambda: load_lexicon_artifact(artifact_path)))
+
+def measure_seconds_to_run_in_new_interpreter(code: str) -> float:
+    script = "import time\nstart = time.perf_counter()\n" + code + "\nprint(time.perf_counter() - start)"
+    output = subprocess.run([sys.executable, '-c', script], cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True).stdout
+    return float(output)
+
+def benchmark_import_time():
+    measurements = {
+        "Importing text_parsing": "import text_parsing",
+        "Importing text_parsing and loading the lexicon": "import text_parsing, lexicon\nlexicon.get_lexicon()",
+        "Importing text_parsing and parsing a word": "import text_parsing\ntext_parsing.create_command_history_list_from_text('test')",
+    }
+    for description, code in measurements.items():
+        seconds = min(measure_seconds_to_run_in_new_interpreter(code) for _ in range(5))
+        print_timing(description, seconds)
+
+def read_repository_source_text() -> str:
+    directory = os.path.dirname(os.path.abspath(__file__))
+    text = ""
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.py') or name.endswith('.md'):
+            with open(os.path.join(directory, name), 'r') as file:
+                text += file.read()
+    return text
+
+def create_large_input(minimum_number_of_characters: int = 200_000) -> str:
+    source_text = read_repository_source_text()
+    repetitions = minimum_number_of_characters // len(source_text) + 1
+    return source_text * repetitions
+
+def print_throughput(description: str, number_of_characters: int, seconds: float):
+    print(f"{description}: {seconds:.2f} s, {number_of_characters / seconds:,.0f} characters per second")
+
+def create_large_prose_input(minimum_number_of_characters: int = 50_000) -> str:
+    directory = os.path.dirname(os.path.abspath(__file__))
+    with open(os.path.join(directory, 'README.md'), 'r') as file:
+        text = file.read()
+    text += "Fix the parser so that it handles long sentences. This is a test of prose, with commas and periods.\n" * 20
+    return text * (minimum_number_of_characters // len(text) + 1)
+
+def benchmark_parsing():
+    from text_parsing import create_command_history_list_from_text
+    inputs = {
+        "Repository sources": create_large_input(),
+        "Long prose candidate": "this is a test" + ", " * 2000,
+        "Markdown and commit message prose": create_large_prose_input(),
+        "Formatted identifiers": "x = SOME_LONG_CONSTANT_NAME + another_snake_case_value\n" * 300,
+    }
+    for description, text in inputs.items():
+        seconds = compute_best_time(lambda: create_command_history_list_from_text(text), 2)
+        print_throughput(description, len(text), seconds)
+
+def benchmark_current_text():
+    from text_parsing import CurrentText
+    for length in [1_000, 10_000, 100_000]:
+        source_text = "a" * length
+        def track_candidate_with_intermediate_matches():
+            current_text = CurrentText(source_text)
+            clones = []
+            for _ in range(length):
+                current_text.append_next_character()
+                clones.append(current_text.clone())
+        seconds = compute_best_time(track_candidate_with_intermediate_matches)
+        print(f"Candidate of {length:,} characters with a match at every character: {seconds / length * 1e6:.2f} microseconds per character")
+
+def benchmark_parsing_engines():
+    from text_parsing import create_command_history_list_from_text, ParsingEngine
+    inputs = {
+        "Repository sources": create_large_input(50_000),
+        "Word followed by 4,000 commas": "word" + "," * 4000,
+    }
+    for description, text in inputs.items():
+        for engine in ParsingEngine:
+            seconds = compute_best_time(lambda: create_command_history_list_from_text(text, engine), 1)
+            print_throughput(description + " with " + engine.name.lower() + " engine", len(text), seconds)
+
+def benchmark_matcher_evaluations():
+    from text_parsing import TextParser
+    text = create_large_input(50_000)
+    parser = TextParser(lambda command: None)
+    seconds = compute_best_time(lambda: parser.generate_command_history_for_text(text), 1)
+    print_throughput("Repository sources", len(text), seconds)
+    print(parser.get_matcher_evaluation_statistics())
+
+def benchmark_smashed_words():
+    from patterns import separate_words_smashed_together
+    from lexicon import get_lexicon
+    lexicon = get_lexicon()
+    def is_word(text: str) -> bool:
+        return lexicon.is_word(text.lower())
+    #Every prefix of these splits into many overlapping words but no separation reaches the end
+    for unit in ['ana', 'isa', 'ai']:
+        for length in [42, 84, 168]:
+            text = unit * (length // len(unit)) + 'q'
+            seconds = compute_best_time(lambda: separate_words_smashed_together(text, is_word))
+            print_timing(f"Separating {len(text)} characters made of {unit!r}", seconds)
+
+def benchmark_parallel_parsing():
+    from text_parsing import create_command_history_list_from_text_in_parallel
+    text = create_large_input(400_000)
+    for number_of_processes in sorted({1, 2, os.cpu_count() or 1}):
+        seconds = compute_best_time(lambda: create_command_history_list_from_text_in_parallel(text, number_of_processes), 1)
+        print_throughput(f"Repository sources with {number_of_processes} processes", len(text), seconds)
+
+def benchmark_command_creation():
+    from text_parsing import create_command_history_list_from_text
+    from patterns import get_command_memo_statistics, clear_command_memo
+    text = create_large_input(100_000)
+    clear_command_memo()
+    seconds = compute_best_time(lambda: create_command_history_list_from_text(text), 1)
+    print_throughput("Repository sources", len(text), seconds)
+    print(get_command_memo_statistics())
+
+def benchmark_serialization():
+    import json
+    from action_records import BasicActionEncoder
+    from text_parsing import create_command_history_list_from_text
+    actions = [action for command in create_command_history_list_from_text(create_large_input(50_000)) for action in command.get_actions()]
+    def serialize_with_general_encoder():
+        for action in actions:
+            json.dumps({'name': action.get_name(), 'arguments': action.get_arguments()}, cls = BasicActionEncoder)
+    def serialize():
+        for action in actions:
+            action.to_json()
+    for description, function in [("General json encoder", serialize_with_general_encoder), ("BasicAction.to_json", serialize)]:
+        seconds = compute_best_time(function)
+        print(f"{description}: {len(actions) / seconds:,.0f} lines per second")
+
+def benchmark_history_memory():
+    import tracemalloc
+    from action_records import read_file_record, CommandHistory
+    from main import output_command_history_to_file
+    from patterns import clear_command_memo
+    from text_parsing import create_command_history_list_from_text
+    text = create_large_input(100_000)
+    for description, create_container in [("list", list), ("CommandHistory", CommandHistory)]:
+        clear_command_memo()
+        tracemalloc.start()
+        command_history = create_command_history_list_from_text(text, command_history=create_container())
+        print(f"Generated {description} of {len(command_history):,} commands: {tracemalloc.get_traced_memory()[1] / (1 << 20):.1f} MiB peak")
+        tracemalloc.stop()
+    with tempfile.TemporaryDirectory() as directory:
+        record_path = os.path.join(directory, 'record.txt')
+        output_command_history_to_file(command_history, record_path)
+        del command_history
+        for description, create_container in [("list", list), ("CommandHistory", CommandHistory)]:
+            tracemalloc.start()
+            record = read_file_record(record_path, create_container())
+            print(f"Read record into {description} of {len(record):,} commands: {tracemalloc.get_traced_memory()[0] / (1 << 20):.1f} MiB held, {tracemalloc.get_traced_memory()[1] / (1 << 20):.1f} MiB peak")
+            del record
+            tracemalloc.stop()
+
+def create_large_record_file(path: str, number_of_lines: int):
+    from main import output_command_history_to_file
+    from text_parsing import create_command_history_list_from_text
+    output_command_history_to_file(create_command_history_list_from_text(create_large_input(number_of_lines)), path)
+
+def benchmark_record_reading():
+    import tracemalloc
+    from action_records import read_file_record, iter_file_record, read_file_record_in_parallel, write_record_index, read_file_record_range
+    with tempfile.TemporaryDirectory() as directory:
+        record_path = os.path.join(directory, 'record.txt')
+        create_large_record_file(record_path, 100_000)
+        record_size = os.path.getsize(record_path)
+        def iterate_lazily():
+            for _ in iter_file_record(record_path):
+                pass
+        for description, function in [("read_file_record", lambda: read_file_record(record_path)), ("iter_file_record", iterate_lazily)]:
+            seconds = compute_best_time(function)
+            tracemalloc.start()
+            function()
+            peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{description}: {record_size / seconds / (1 << 20):.1f} MiB per second, {peak_memory / (1 << 20):.1f} MiB peak")
+        for number_of_processes in sorted({2, os.cpu_count() or 1}):
+            seconds = compute_best_time(lambda: read_file_record_in_parallel(record_path, number_of_processes), 1)
+            print(f"read_file_record_in_parallel with {number_of_processes} processes: {record_size / seconds / (1 << 20):.1f} MiB per second")
+        index = write_record_index(record_path)
+        middle_command_number = index.get_number_of_commands() // 2
+        print_timing("Reading 100 commands from the middle with the index", compute_best_time(lambda: read_file_record_range(record_path, middle_command_number, middle_command_number + 100, index)))
+        print_timing("Reading 100 commands from the middle without the index", compute_best_time(lambda: read_file_record(record_path)[middle_command_number:middle_command_number + 100]))
+
+def benchmark_binary_records():
+    from action_records import read_file_record, read_binary_file_record, CommandHistory
+    from main import convert_text_record_to_binary
+    with tempfile.TemporaryDirectory() as directory:
+        text_record_path = os.path.join(directory, 'record.txt')
+        binary_record_path = os.path.join(directory, 'record.bin')
+        create_large_record_file(text_record_path, 100_000)
+        convert_text_record_to_binary(text_record_path, binary_record_path)
+        print(f"Text record: {os.path.getsize(text_record_path) / (1 << 20):.1f} MiB, binary record: {os.path.getsize(binary_record_path) / (1 << 20):.1f} MiB")
+        for description, function in [
+            ("Reading the text record into a list", lambda: read_file_record(text_record_path)),
+            ("Reading the binary record into a list", lambda: read_binary_file_record(binary_record_path)),
+            ("Reading the text record into a CommandHistory", lambda: read_file_record(text_record_path, CommandHistory())),
+            ("Reading the binary record into a CommandHistory", lambda: read_binary_file_record(binary_record_path, CommandHistory())),
+        ]:
+            print_timing(description, compute_best_time(function))
+
+def benchmark_compression():
+    from action_records import read_file_record, read_binary_file_record, COMPRESSION_FORMATS
+    from main import output_records_to_text_file, output_commands_to_binary_file
+    with tempfile.TemporaryDirectory() as directory:
+        create_large_record_file(os.path.join(directory, 'source.txt'), 100_000)
+        records = read_file_record(os.path.join(directory, 'source.txt'))
+        for compression in COMPRESSION_FORMATS:
+            for record_format, write_records, read_records in [
+                ('text', output_records_to_text_file, read_file_record),
+                ('binary', output_commands_to_binary_file, read_binary_file_record),
+            ]:
+                path = os.path.join(directory, 'record.' + record_format)
+                write_seconds = compute_best_time(lambda: write_records(records, path, compression), 1)
+                read_seconds = compute_best_time(lambda: read_records(path, compression=compression))
+                size = os.path.getsize(path) / (1 << 20)
+                print(f"{record_format} record with {compression} compression: {size:.2f} MiB, writing {write_seconds * 1000:.1f} ms, reading {read_seconds * 1000:.1f} ms")
+
+BENCHMARKS = {
+    'lexicon-loading': benchmark_lexicon_loading,
+    'import-time': benchmark_import_time,
+    'parsing': benchmark_parsing,
+    'current-text': benchmark_current_text,
+    'engines': benchmark_parsing_engines,
+    'matcher-evaluations': benchmark_matcher_evaluations,
+    'smashed-words': benchmark_smashed_words,
+    'parallel': benchmark_parallel_parsing,
+    'command-creation': benchmark_command_creation,
+    'serialization': benchmark_serialization,
+    'history-memory': benchmark_history_memory,
+    'record-reading': benchmark_record_reading,
+    'binary-records': benchmark_binary_records,
+    'compression': benchmark_compression,
+}
+
+if __name__ == '__main__':
+    argument_parser = argparse.ArgumentParser(description='Times performance sensitive parts of the command history generator')
+    argument_parser.add_argument('benchmarks', nargs='*', help='The benchmarks to run out of: ' + ', '.join(BENCHMARKS) + '. Every benchmark runs if none are given.')
+    arguments = argument_parser.parse_args()
+    for name in arguments.benchmarks:
+        if name not in BENCHMARKS:
+            argument_parser.error('unknown benchmark ' + name)
+    for name in arguments.benchmarks or BENCHMARKS:
+        print(name)
+        BENCHMARKS[name]()
@@ -0,0 +1,29 @@
+class BoundedCache:
+    """Remembers values by key up to a maximum number of them and forgets all of them once it is full.
+        Forgetting everything at once keeps lookups as cheap as a dictionary lookup, which matters for the
+        caches consulted for every character of the input.
+    """
+    __slots__ = ('values', 'maximum_size', 'get')
+
+    def __init__(self, maximum_size: int):
+        self.values = {}
+        self.maximum_size = maximum_size
+        #The lookup is the dictionary method itself so that it costs no extra function call
+        self.get = self.values.get
+
+    def remember(self, key, value):
+        if len(self.values) >= self.maximum_size:
+            self.values.clear()
+        self.values[key] = value
+
+    def clear(self):
+        self.values.clear()
+
+    def get_maximum_size(self) -> int:
+        return self.maximum_size
+
+    def __len__(self):
+        return len(self.values)
+
+    def __contains__(self, key):
+        return key in self.values
@@ -0,0 +1,225 @@
+from array import array
+from typing import Iterable, List
+from bounded_cache import BoundedCache
+import hashlib
+import mmap
+import os
+import struct
+import sys
+
+CURRENT_DIRECTORY = os.path.dirname(__file__)
+RESOURCES_DIRECTORY = os.path.join(CURRENT_DIRECTORY, 'resources')
+WORDS_FILE_PATH = os.path.join(RESOURCES_DIRECTORY, 'words.txt')
+LEXICON_ARTIFACT_PATH = os.path.join(RESOURCES_DIRECTORY, 'words.lexicon')
+
+#The artifact is a header followed by an offset table and the sorted words packed together as utf-8.
+#The header remembers the size, modification time, change time and hash of the word list.
+#Only a word list whose times changed since the artifact was compiled has to be read to check if its words changed.
+LEXICON_ARTIFACT_MAGIC = b'ATLX'
+LEXICON_ARTIFACT_FORMAT_VERSION = 2
+LEXICON_ARTIFACT_HEADER = struct.Struct('<4sHHIQQQ32s')
+OFFSET_TYPE_CODE = 'I'
+MAXIMUM_NUMBER_OF_REMEMBERED_LOOKUPS = 1 << 18
+
+class Lexicon:
+    """Answers word and word prefix questions about the word list.
+        The words are stored sorted and packed together with an offset table,
+        which lets the lexicon work directly on a memory mapped artifact.
+    """
+    def __init__(self, packed_words, offsets, maximum_word_length: int, version: str, packed_words_start: int = 0):
+        self.packed_words = packed_words
+        self.packed_words_start = packed_words_start
+        self.offsets = offsets
+        self.number_of_words = len(offsets) - 1
+        self.maximum_word_length = maximum_word_length
+        self.version = version
+        self.known_words = BoundedCache(MAXIMUM_NUMBER_OF_REMEMBERED_LOOKUPS)
+        self.known_word_starts = BoundedCache(MAXIMUM_NUMBER_OF_REMEMBERED_LOOKUPS)
+
+    def _get_word_bytes(self, index: int) -> bytes:
+        start = self.packed_words_start
+        return self.packed_words[start + self.offsets[index]:start + self.offsets[index + 1]]
+
+    def _compute_insertion_index(self, key: bytes) -> int:
+        low = 0
+        high = self.number_of_words
+        while low < high:
+            middle = (low + high) // 2
+            if self._get_word_bytes(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def is_word(self, text: str) -> bool:
+        outcome = self.known_words.get(text)
+        if outcome is None:
+            key = text.encode('utf-8')
+            index = self._compute_insertion_index(key)
+            outcome = index < self.number_of_words and self._get_word_bytes(index) == key
+            self.known_words.remember(text, outcome)
+        return outcome
+
+    def could_be_start_of_word(self, text: str) -> bool:
+        outcome = self.known_word_starts.get(text)
+        if outcome is None:
+            key = text.encode('utf-8')
+            index = self._compute_insertion_index(key)
+            outcome = index < self.number_of_words and self._get_word_bytes(index).startswith(key)
+            self.known_word_starts.remember(text, outcome)
+        return outcome
+
+    def could_be_start_of_words_smashed_together(self, text: str) -> bool:
+        """Determines if the text could be a series of words followed by the start of another word"""
+        word_ending_indexes = {0}
+        for start in range(len(text)):
+            if start not in word_ending_indexes:
+                continue
+            for end in range(start + 1, len(text) + 1):
+                potential_word = text[start:end]
+                if not self.could_be_start_of_word(potential_word):
+                    break
+                if end == len(text):
+                    return True
+                if self.is_word(potential_word):
+                    word_ending_indexes.add(end)
+        return False
+
+    def get_maximum_word_length(self) -> int:
+        return self.maximum_word_length
+
+    def get_version(self) -> str:
+        """Returns the hash of the word list the lexicon was built from"""
+        return self.version
+
+    def __contains__(self, text: str) -> bool:
+        return self.is_word(text)
+
+    def __len__(self) -> int:
+        return self.number_of_words
+
+    def __iter__(self):
+        for index in range(self.number_of_words):
+            yield self._get_word_bytes(index).decode('utf-8')
+
+class InvalidLexiconArtifactException(Exception): pass
+
+def load_words_from_text(path: str = WORDS_FILE_PATH) -> List[str]:
+    with open(path, 'r') as words_file:
+        words = words_file.read().splitlines()
+    return words
+
+def compute_maximum_text_length(texts: Iterable[str]) -> int:
+    max_length = 0
+    for text in texts:
+        max_length = max(max_length, len(text))
+    return max_length
+
+def compute_file_hash(path: str) -> bytes:
+    with open(path, 'rb') as file:
+        return hashlib.sha256(file.read()).digest()
+
+def pack_words(words: Iterable[str]):
+    encoded_words = sorted(set(word.encode('utf-8') for word in words))
+    offsets = array(OFFSET_TYPE_CODE, [0])
+    current_offset = 0
+    for encoded_word in encoded_words:
+        current_offset += len(encoded_word)
+        offsets.append(current_offset)
+    return b''.join(encoded_words), offsets
+
+def create_lexicon_from_words(words: Iterable[str], version: str = '') -> Lexicon:
+    words = list(words)
+    packed_words, offsets = pack_words(words)
+    return Lexicon(packed_words, offsets, compute_maximum_text_length(words), version)
+
+def compile_lexicon_artifact(words_path: str = WORDS_FILE_PATH, artifact_path: str = LEXICON_ARTIFACT_PATH):
+    """Compiles the word list into the binary artifact that load_lexicon memory maps"""
+    words = load_words_from_text(words_path)
+    packed_words, offsets = pack_words(words)
+    if sys.byteorder != 'little':
+        offsets.byteswap()
+    words_file_status = os.stat(words_path)
+    header = LEXICON_ARTIFACT_HEADER.pack(
+        LEXICON_ARTIFACT_MAGIC,
+        LEXICON_ARTIFACT_FORMAT_VERSION,
+        compute_maximum_text_length(words),
+        len(offsets) - 1,
+        words_file_status.st_size,
+        words_file_status.st_mtime_ns,
+        words_file_status.st_ctime_ns,
+        compute_file_hash(words_path),
+    )
+    temporary_path = artifact_path + '.tmp' + str(os.getpid())
+    with open(temporary_path, 'wb') as artifact_file:
+        artifact_file.write(header)
+        artifact_file.write(offsets.tobytes())
+        artifact_file.write(packed_words)
+    os.replace(temporary_path, artifact_path)
+
+def _read_artifact_header(artifact_buffer):
+    if len(artifact_buffer) < LEXICON_ARTIFACT_HEADER.size:
+        raise InvalidLexiconArtifactException
+    header = LEXICON_ARTIFACT_HEADER.unpack_from(artifact_buffer)
+    magic, format_version = header[0], header[1]
+    if magic != LEXICON_ARTIFACT_MAGIC or format_version != LEXICON_ARTIFACT_FORMAT_VERSION:
+        raise InvalidLexiconArtifactException
+    return header
+
+def is_lexicon_artifact_current(artifact_path: str = LEXICON_ARTIFACT_PATH, words_path: str = WORDS_FILE_PATH) -> bool:
+    try:
+        with open(artifact_path, 'rb') as artifact_file:
+            header = _read_artifact_header(artifact_file.read(LEXICON_ARTIFACT_HEADER.size))
+    except (OSError, InvalidLexiconArtifactException):
+        return False
+    words_file_status = os.stat(words_path)
+    words_file_size, words_file_modification_time, words_file_change_time, words_hash = header[4:]
+    if words_file_size != words_file_status.st_size:
+        return False
+    #Copying the word list or editing it while keeping its modification time still updates the change time
+    if words_file_modification_time == words_file_status.st_mtime_ns and words_file_change_time == words_file_status.st_ctime_ns:
+        return True
+    return words_hash == compute_file_hash(words_path)
+
+def load_lexicon_artifact(artifact_path: str = LEXICON_ARTIFACT_PATH) -> Lexicon:
+    with open(artifact_path, 'rb') as artifact_file:
+        artifact_buffer = mmap.mmap(artifact_file.fileno(), 0, access=mmap.ACCESS_READ)
+    _, _, maximum_word_length, number_of_words, _, _, _, words_hash = _read_artifact_header(artifact_buffer)
+    offsets_start = LEXICON_ARTIFACT_HEADER.size
+    packed_words_start = offsets_start + (number_of_words + 1) * array(OFFSET_TYPE_CODE).itemsize
+    if len(artifact_buffer) < packed_words_start:
+        raise InvalidLexiconArtifactException
+    if sys.byteorder == 'little':
+        offsets = memoryview(artifact_buffer)[offsets_start:packed_words_start].cast(OFFSET_TYPE_CODE)
+    else:
+        offsets = array(OFFSET_TYPE_CODE, artifact_buffer[offsets_start:packed_words_start])
+        offsets.byteswap()
+    if len(artifact_buffer) - packed_words_start != offsets[-1]:
+        raise InvalidLexiconArtifactException
+    return Lexicon(artifact_buffer, offsets, maximum_word_length, words_hash.hex(), packed_words_start)
+
+def load_lexicon(words_path: str = WORDS_FILE_PATH, artifact_path: str = LEXICON_ARTIFACT_PATH) -> Lexicon:
+    """Loads the lexicon from the compiled artifact, rebuilding the artifact first if the word list changed"""
+    try:
+        if not is_lexicon_artifact_current(artifact_path, words_path):
+            compile_lexicon_artifact(words_path, artifact_path)
+        return load_lexicon_artifact(artifact_path)
+    except (OSError, InvalidLexiconArtifactException):
+        words = load_words_from_text(words_path)
+        return create_lexicon_from_words(words, compute_file_hash(words_path).hex())
+
+_default_lexicon = None
+
+def get_lexicon() -> Lexicon:
+    """Returns the lexicon for the project word list, loading it the first time it is needed"""
+    global _default_lexicon
+    if _default_lexicon is None:
+        _default_lexicon = load_lexicon()
+    return _default_lexicon
+
+def has_lexicon_been_loaded() -> bool:
+    return _default_lexicon is not None
+
+if __name__ == '__main__':
+    compile_lexicon_artifact()
+    print("Compiled " + LEXICON_ARTIFACT_PATH)
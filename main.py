@@ -1,6 +1,20 @@
-from text_parsing import create_command_history_list_from_text
-from action_records import Command, BasicAction
+from text_parsing import create_command_history_list_from_text_in_parallel, generate_commands_from_text_chunks, create_text_parser, ParsingEngine
+from action_records import Command, BasicAction, RECORDING_START_MESSAGE, COMMAND_NAME_PREFIX, RecordIndex, compute_record_index_path, write_record_index, \
+    BinaryRecordEncoder, iter_file_record, iter_binary_file_record, is_binary_record_file, compute_time_difference_text, open_record_file, find_record_compression, \
+    COMPRESSION_FORMATS, NO_COMPRESSION, GZIP_COMPRESSION, BZ2_COMPRESSION, LZMA_COMPRESSION
+from lexicon import get_lexicon
+from result_cache import ResultCache, DEFAULT_MAXIMUM_RESULT_CACHE_SIZE, compute_generator_version
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List
 import argparse
+import difflib
+import functools
+import glob
+import hashlib
+import json
+import os
+import re
+import time
 
 def extract_text_without_indentation(file):
     text = ""
@@ -8,7 +22,56 @@ def extract_text_without_indentation(file):
         text += line.lstrip()
     return text
 
-def create_command_history_list_from_text_file(file_path: str, spaces_per_tab=0, *, should_ignore_indentation):
+#ParsingEngine.SEGMENTING scans from every alphabetic character, which is several times slower than greedy on ordinary source files, so it is left out
+PARSING_ENGINE_NAMES = {
+    'greedy': ParsingEngine.GREEDY,
+    'compatible-segmenting': ParsingEngine.COMPATIBLE_SEGMENTING,
+}
+
+INPUT_CHUNK_SIZE = 1 << 16
+INDENTATION_REGEX = re.compile(r'\n\s+')
+
+def generate_text_chunks_from_file(file, spaces_per_tab=0, *, should_ignore_indentation, chunk_size: int = INPUT_CHUNK_SIZE) -> Iterator[str]:
+    """Reads the file in chunks of bounded size and applies the same changes to the text as reading the whole file would"""
+    is_at_start_of_line = True
+    spaces_carried_over = ""
+    while True:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            break
+        if should_ignore_indentation:
+            if is_at_start_of_line:
+                chunk = chunk.lstrip()
+            chunk = INDENTATION_REGEX.sub('\n', chunk)
+            if chunk:
+                is_at_start_of_line = chunk.endswith('\n')
+        if spaces_per_tab > 0:
+            chunk = spaces_carried_over + chunk
+            #Spaces at the end of the chunk that do not make up a whole tab could combine with spaces at the start of the next chunk
+            number_of_trailing_spaces = len(chunk) - len(chunk.rstrip(' '))
+            number_of_spaces_to_carry_over = number_of_trailing_spaces % spaces_per_tab
+            spaces_carried_over = ' ' * number_of_spaces_to_carry_over
+            chunk = chunk[:len(chunk) - number_of_spaces_to_carry_over].replace(' ' * spaces_per_tab, '\t')
+        yield chunk
+    if spaces_carried_over:
+        yield spaces_carried_over
+
+def can_stream_commands(engine: ParsingEngine, number_of_processes: int) -> bool:
+    return engine == ParsingEngine.GREEDY and number_of_processes <= 1
+
+def generate_commands_from_text_file(file_path: str, spaces_per_tab=0, *, should_ignore_indentation, engine: ParsingEngine = ParsingEngine.GREEDY, number_of_processes: int = 1) -> Iterator[Command]:
+    """Yields the commands for the file. The greedy engine on a single process reads the file in chunks
+        and yields commands as they are created, so memory use does not grow with the file size.
+    """
+    if not can_stream_commands(engine, number_of_processes):
+        yield from create_command_history_list_from_text_file(file_path, spaces_per_tab, should_ignore_indentation=should_ignore_indentation, engine=engine, number_of_processes=number_of_processes)
+        return
+    with open(file_path, 'r') as file:
+        yield from generate_commands_from_text_chunks(generate_text_chunks_from_file(file, spaces_per_tab, should_ignore_indentation=should_ignore_indentation))
+
+def create_command_history_list_from_text_file(file_path: str, spaces_per_tab=0, *, should_ignore_indentation, engine: ParsingEngine = ParsingEngine.GREEDY, number_of_processes: int = 1):
+    if can_stream_commands(engine, number_of_processes):
+        return list(generate_commands_from_text_file(file_path, spaces_per_tab, should_ignore_indentation=should_ignore_indentation))
     with open(file_path, 'r') as file:
         if should_ignore_indentation:
             text = extract_text_without_indentation(file)
@@ -16,17 +79,447 @@ def create_command_history_list_from_text_file(file_path: str, spaces_per_tab=0,
             text = file.read()
     if spaces_per_tab > 0:
         text = text.replace(' ' * spaces_per_tab, '\t')
-    return create_command_history_list_from_text(text)
+    return create_command_history_list_from_text_in_parallel(text, number_of_processes, engine)
+
+def compute_command_record(command: Command) -> str:
+    return "Command: " + command.get_name() + '\n' + ''.join(action.to_json() + '\n' for action in command.get_actions())
 
 def record_command_to_file(command: Command, file):
-    file.write("Command: " + command.get_name() + '\n')
-    for action in command.get_actions():
-        file.write(action.to_json() + '\n')
+    file.write(compute_command_record(command))
+
+OUTPUT_BLOCK_SIZE = 1 << 20
+
+def output_commands_to_file(commands: Iterable[Command], file_path, should_write_index: bool = False, compression: str = None) -> int:
+    """Writes the records for the commands as they are produced in large blocks and returns the number of commands written.
+        Can also write an index of the command offsets next to the record for reading parts of it with read_file_record_range.
+        The record is compressed as it is written when the compression or the extension of the path asks for it.
+    """
+    number_of_commands = 0
+    block = []
+    block_size = 0
+    if should_write_index and find_record_compression(file_path, compression) is not None:
+        raise ValueError('Compressed records cannot be indexed because they cannot be read by byte range')
+    index = RecordIndex() if should_write_index else None
+    with open_record_file(file_path, 'w', compression) as file:
+        for command in commands:
+            record = compute_command_record(command)
+            if index is not None:
+                #Commands without actions are skipped when reading records, so they do not get an offset
+                if command.get_actions():
+                    index.add_command(index.record_size)
+                index.record_size += len(record) if record.isascii() else len(record.encode('utf-8'))
+            block.append(record)
+            block_size += len(record)
+            number_of_commands += 1
+            if block_size >= OUTPUT_BLOCK_SIZE:
+                file.write(''.join(block))
+                block.clear()
+                block_size = 0
+        file.write(''.join(block))
+    if index is not None:
+        index.save(compute_record_index_path(file_path))
+    return number_of_commands
+
+def output_command_history_to_file(command_history, file_path, compression: str = None):
+    return output_commands_to_file(command_history, file_path, compression=compression)
+
+TEXT_RECORD_FORMAT = 'text'
+BINARY_RECORD_FORMAT = 'binary'
+RECORD_FORMATS = [TEXT_RECORD_FORMAT, BINARY_RECORD_FORMAT]
+
+def output_commands_to_binary_file(commands: Iterable, file_path, compression: str = None) -> int:
+    """Writes the commands and recording starts in the binary record format as they are produced and returns the number of records written"""
+    number_of_records = 0
+    encoder = BinaryRecordEncoder()
+    block = [encoder.create_header()]
+    block_size = 0
+    with open_record_file(file_path, 'wb', compression) as file:
+        for record in commands:
+            #Reading a text record skips commands without actions, so they are left out here as well for both formats to hold the same records
+            if record.is_command_record() and not record.get_actions():
+                continue
+            encoded_record = encoder.encode_record(record)
+            block.append(encoded_record)
+            block_size += len(encoded_record)
+            number_of_records += 1
+            if block_size >= OUTPUT_BLOCK_SIZE:
+                file.write(b''.join(block))
+                block.clear()
+                block_size = 0
+        file.write(b''.join(block))
+    return number_of_records
+
+#A command start line without actions begins a command that reading skips, which makes it forget the time difference carried over to the next command
+def check_command_name_for_text_record(name: str):
+    #Record lines are split at new lines and stripped when they are read
+    if '\n' in name or name != name.rstrip():
+        raise ValueError(f'The command name {name!r} cannot be written to a text record because it has a line break or ends with whitespace')
+
+def _does_survive_json(value) -> bool:
+    try:
+        return json.loads(json.dumps(value)) == value
+    except (TypeError, ValueError):
+        return False
+
+def check_action_for_text_record(action: BasicAction):
+    #Text records keep arguments as json, which turns captures into strings and tuples into lists
+    for argument in action.get_arguments():
+        if argument is None or type(argument) in (str, int, float, bool):
+            continue
+        if type(argument) in (list, dict) and _does_survive_json(argument):
+            continue
+        raise ValueError(f'The argument {argument!r} of the action {action.get_name()} cannot be written to a text record because reading it would give back a different value')
+
+def generate_record_texts(records: Iterable) -> Iterator[str]:
+    """Yields the text for the commands and recording starts so that reading it gives back the same records.
+        A time difference line applies to the command begun by the next command start or recording start line, so the time for a command
+        without a name, which follows a recording start without a command start line, goes in front of that recording start.
+        Commands without actions are skipped because reading never produces them.
+        Raises ValueError for records the text format cannot represent, which are commands without a name that do not start
+        the record or a recording, commands without a name at the start of the record with a time difference, and names and actions that do not
+        survive check_command_name_for_text_record and check_action_for_text_record.
+    """
+    is_recording_start_pending = False
+    #Only a command without a name that comes before any other command of the record or recording can be written without a command start line
+    is_at_start_of_recording = True
+    for record in records:
+        if not record.is_command_record():
+            if is_recording_start_pending:
+                yield RECORDING_START_MESSAGE + '\n'
+            is_recording_start_pending = True
+            is_at_start_of_recording = True
+            continue
+        if not record.get_actions():
+            continue
+        for action in record.get_actions():
+            check_action_for_text_record(action)
+        time_difference_text = compute_time_difference_text(record.get_seconds_since_action()) + '\n' if record.is_time_information_available() else ''
+        if record.get_name():
+            check_command_name_for_text_record(record.get_name())
+            if is_recording_start_pending:
+                yield RECORDING_START_MESSAGE + '\n'
+                is_recording_start_pending = False
+            yield time_difference_text + compute_command_record(record)
+        else:
+            if not is_at_start_of_recording:
+                raise ValueError('A command without a name can only be written to a text record before the other commands of the record or of a recording')
+            if is_recording_start_pending:
+                yield time_difference_text + RECORDING_START_MESSAGE + '\n'
+                is_recording_start_pending = False
+            elif time_difference_text:
+                raise ValueError('A command without a name at the start of a text record cannot have a time difference')
+            yield ''.join(action.to_json() + '\n' for action in record.get_actions())
+        is_at_start_of_recording = False
+    if is_recording_start_pending:
+        yield RECORDING_START_MESSAGE + '\n'
+
+def output_records_to_text_file(records: Iterable, file_path, compression: str = None) -> int:
+    """Writes the commands and recording starts to a text record file and returns the number of records written.
+        If some record cannot be written to a text record, the file is removed and the ValueError from generate_record_texts is raised.
+    """
+    number_of_records = 0
+    def count_records():
+        nonlocal number_of_records
+        for record in records:
+            number_of_records += 1
+            yield record
+    block = []
+    block_size = 0
+    file = open_record_file(file_path, 'w', compression)
+    try:
+        with file:
+            for record_text in generate_record_texts(count_records()):
+                block.append(record_text)
+                block_size += len(record_text)
+                if block_size >= OUTPUT_BLOCK_SIZE:
+                    file.write(''.join(block))
+                    block.clear()
+                    block_size = 0
+            file.write(''.join(block))
+    except ValueError:
+        os.remove(file_path)
+        raise
+    return number_of_records
+
+def convert_text_record_to_binary(text_record_path: str, binary_record_path: str) -> int:
+    """Writes the records in the text record file to a binary record file that reads back as the same records, returning the number of records"""
+    return output_commands_to_binary_file(iter_file_record(text_record_path), binary_record_path)
+
+def convert_binary_record_to_text(binary_record_path: str, text_record_path: str) -> int:
+    """Writes the records in the binary record file to a text record file that reads back as the same records, returning the number of records.
+        Raises ValueError if the binary record has records that generate_record_texts cannot write.
+    """
+    return output_records_to_text_file(iter_binary_file_record(binary_record_path), text_record_path)
+
+def convert_record(input_path: str, output_path: str) -> int:
+    """Converts a text record to a binary one or the other way around. Either record can be compressed, which is decided by its extension."""
+    if is_binary_record_file(input_path):
+        return convert_binary_record_to_text(input_path, output_path)
+    return convert_text_record_to_binary(input_path, output_path)
+
+def count_commands_in_record(lines: Iterable[str]) -> int:
+    return sum(1 for line in lines if line.startswith(COMMAND_NAME_PREFIX))
+
+def count_commands_in_record_file(path: str, compression: str = None) -> int:
+    if is_binary_record_file(path, compression):
+        return sum(1 for record in iter_binary_file_record(path, compression) if record.is_command_record())
+    with open_record_file(path, 'r', compression) as file:
+        return count_commands_in_record(file)
+
+def compute_result_cache_key(result_cache: ResultCache, input_path: str, *, spaces_per_tab: int, should_ignore_indentation: bool, engine: ParsingEngine,
+                             record_format: str = TEXT_RECORD_FORMAT, compression: str = None) -> str:
+    return result_cache.compute_key(input_path, spaces_per_tab=spaces_per_tab, should_ignore_indentation=should_ignore_indentation, engine=engine.name, record_format=record_format,
+                                    compression=compression or NO_COMPRESSION)
+
+def output_commands_for_text_file(input_path: str, output_path: str, spaces_per_tab=0, *, should_ignore_indentation, engine: ParsingEngine = ParsingEngine.GREEDY,
+                                  number_of_processes: int = 1, result_cache: ResultCache = None, should_write_index: bool = False, record_format: str = TEXT_RECORD_FORMAT,
+                                  compression: str = None) -> int:
+    """Writes the record for the input file to the output path in the record format and returns the number of commands in it.
+        With a result cache, a record generated before for the same input and options is copied instead of generated again.
+        The index is only written for text records. The record is compressed when the compression or the extension of the output path asks for it.
+    """
+    compression = find_record_compression(output_path, compression) or NO_COMPRESSION
+    if result_cache is not None:
+        key = compute_result_cache_key(result_cache, input_path, spaces_per_tab=spaces_per_tab, should_ignore_indentation=should_ignore_indentation, engine=engine,
+                                       record_format=record_format, compression=compression)
+        if result_cache.copy_entry(key, output_path):
+            if should_write_index and record_format == TEXT_RECORD_FORMAT:
+                write_record_index(output_path)
+            return count_commands_in_record_file(output_path, compression)
+    commands = generate_commands_from_text_file(input_path, spaces_per_tab, should_ignore_indentation=should_ignore_indentation, engine=engine, number_of_processes=number_of_processes)
+    if record_format == BINARY_RECORD_FORMAT:
+        number_of_commands = output_commands_to_binary_file(commands, output_path, compression)
+    else:
+        number_of_commands = output_commands_to_file(commands, output_path, should_write_index, compression)
+    if result_cache is not None:
+        result_cache.store_file(key, output_path)
+    return number_of_commands
+
+def create_record_text_for_text_file(input_path: str, spaces_per_tab=0, *, should_ignore_indentation, engine: ParsingEngine = ParsingEngine.GREEDY, result_cache: ResultCache = None):
+    """Returns the number of commands for the input file and its record as text, using the result cache like output_commands_for_text_file"""
+    if result_cache is not None:
+        key = compute_result_cache_key(result_cache, input_path, spaces_per_tab=spaces_per_tab, should_ignore_indentation=should_ignore_indentation, engine=engine)
+        record = result_cache.read_entry(key)
+        if record is not None:
+            return count_commands_in_record(record.splitlines()), record
+    commands = generate_commands_from_text_file(input_path, spaces_per_tab, should_ignore_indentation=should_ignore_indentation, engine=engine)
+    records = [compute_command_record(command) for command in commands]
+    record = ''.join(records)
+    if result_cache is not None:
+        result_cache.store_text(key, record)
+    return len(records), record
+
+INCREMENTAL_INDEX_EXTENSION = '.index'
+INCREMENTAL_INDEX_FORMAT_VERSION = 1
+LINE_REGEX = re.compile(r'[^\n]*\n|[^\n]+')
+
+def split_text_into_lines(text: str) -> List[str]:
+    """Splits the text after every new line. Parsing always starts over after a new line,
+        so the record for the text is the records for its lines put together.
+    """
+    return LINE_REGEX.findall(text)
+
+def compute_line_hash(line: str) -> str:
+    return hashlib.blake2b(line.encode('utf-8', 'surrogatepass'), digest_size=16).hexdigest()
+
+class IncrementalIndex:
+    """Remembers the hash of every line of the input along with the length of its part of the record and its number of commands"""
+    def __init__(self, options: dict, line_hashes: List[str] = None, record_lengths: List[int] = None, numbers_of_commands: List[int] = None):
+        self.options = options
+        self.line_hashes = line_hashes or []
+        self.record_lengths = record_lengths or []
+        self.numbers_of_commands = numbers_of_commands or []
+
+    def add_line(self, line_hash: str, record_length: int, number_of_commands: int):
+        self.line_hashes.append(line_hash)
+        self.record_lengths.append(record_length)
+        self.numbers_of_commands.append(number_of_commands)
+
+    def get_line_hashes(self) -> List[str]:
+        return self.line_hashes
+
+    def get_record_length(self, line_number: int) -> int:
+        return self.record_lengths[line_number]
+
+    def get_number_of_commands(self, line_number: int) -> int:
+        return self.numbers_of_commands[line_number]
+
+    def compute_total_number_of_commands(self) -> int:
+        return sum(self.numbers_of_commands)
+
+    def save(self, path: str):
+        representation = {
+            'format_version': INCREMENTAL_INDEX_FORMAT_VERSION,
+            'options': self.options,
+            'lines': list(zip(self.line_hashes, self.record_lengths, self.numbers_of_commands)),
+        }
+        with open(path, 'w') as file:
+            json.dump(representation, file)
+
+    @staticmethod
+    def load(path: str, options: dict):
+        """Returns the index at the path or None if there is none or it was made with different options"""
+        try:
+            with open(path, 'r') as file:
+                representation = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if representation.get('format_version') != INCREMENTAL_INDEX_FORMAT_VERSION or representation.get('options') != options:
+            return None
+        index = IncrementalIndex(options)
+        for line_hash, record_length, number_of_commands in representation['lines']:
+            index.add_line(line_hash, record_length, number_of_commands)
+        return index
+
+def compute_incremental_index_options(*, spaces_per_tab: int, should_ignore_indentation: bool, engine: ParsingEngine, should_write_index: bool = False,
+                                      compression: str = NO_COMPRESSION) -> dict:
+    """Returns every option that affects the output of an incremental run. The record is reused only if all of them are unchanged."""
+    return {
+        'spaces_per_tab': spaces_per_tab,
+        'should_ignore_indentation': should_ignore_indentation,
+        'engine': engine.name,
+        'record_format': TEXT_RECORD_FORMAT,
+        'should_write_index': should_write_index,
+        'compression': compression,
+        'generator_version': compute_generator_version(),
+    }
+
+def regenerate_record_incrementally(input_path: str, output_path: str, spaces_per_tab=0, *, should_ignore_indentation, engine: ParsingEngine = ParsingEngine.GREEDY,
+                                    should_write_index: bool = False, compression: str = None):
+    """Writes the record for the input file to the output path, reusing the parts of the record written for the lines
+        that did not change since the last incremental run, and keeps an index next to the record for the next run.
+        Returns the number of commands in the record and the number of lines that were parsed.
+    """
+    #The temporary path has no extension to find the compression from
+    compression = find_record_compression(output_path, compression) or NO_COMPRESSION
+    options = compute_incremental_index_options(spaces_per_tab=spaces_per_tab, should_ignore_indentation=should_ignore_indentation, engine=engine,
+                                                should_write_index=should_write_index, compression=compression)
+    with open(input_path, 'r') as file:
+        lines = split_text_into_lines(''.join(generate_text_chunks_from_file(file, spaces_per_tab, should_ignore_indentation=should_ignore_indentation)))
+    line_hashes = [compute_line_hash(line) for line in lines]
+    index_path = output_path + INCREMENTAL_INDEX_EXTENSION
+    previous_index = None
+    if os.path.exists(output_path):
+        previous_index = IncrementalIndex.load(index_path, options)
+    previous_line_hashes = previous_index.get_line_hashes() if previous_index is not None else []
+    line_commands = []
+    text_parser = create_text_parser(line_commands.append, engine)
+    index = IncrementalIndex(options)
+    number_of_parsed_lines = 0
+    temporary_path = output_path + '.tmp' + str(os.getpid())
+    with open_record_file(temporary_path, 'w', compression) as output_file, \
+            open_record_file(output_path, 'r', compression) if previous_index is not None else open(os.devnull, 'r') as previous_record_file:
+        opcodes = difflib.SequenceMatcher(None, previous_line_hashes, line_hashes, autojunk=False).get_opcodes()
+        for operation, previous_start, previous_end, start, end in opcodes:
+            #The previous record is read in order so that the parts for unchanged lines can be copied and the rest skipped
+            for previous_line_number in range(previous_start, previous_end):
+                line_record = previous_record_file.read(previous_index.get_record_length(previous_line_number))
+                if operation == 'equal':
+                    output_file.write(line_record)
+                    line_number = start + previous_line_number - previous_start
+                    index.add_line(line_hashes[line_number], len(line_record), previous_index.get_number_of_commands(previous_line_number))
+            if operation == 'equal':
+                continue
+            for line_number in range(start, end):
+                text_parser.generate_command_history_for_text(lines[line_number])
+                line_record = ''.join(compute_command_record(command) for command in line_commands)
+                output_file.write(line_record)
+                index.add_line(line_hashes[line_number], len(line_record), len(line_commands))
+                line_commands.clear()
+                number_of_parsed_lines += 1
+    os.replace(temporary_path, output_path)
+    index.save(index_path)
+    if should_write_index:
+        write_record_index(output_path)
+    return index.compute_total_number_of_commands(), number_of_parsed_lines
+
+def find_batch_input_files(directory_or_pattern: str) -> List[str]:
+    if os.path.isdir(directory_or_pattern):
+        paths = [os.path.join(directory, name) for directory, _, names in os.walk(directory_or_pattern) for name in names]
+    else:
+        paths = [path for path in glob.glob(directory_or_pattern, recursive=True) if os.path.isfile(path)]
+    return sorted(paths)
+
+RECORD_FILE_EXTENSION = '.txt'
+
+COMPRESSION_FILE_EXTENSIONS = {GZIP_COMPRESSION: '.gz', BZ2_COMPRESSION: '.bz2', LZMA_COMPRESSION: '.xz', NO_COMPRESSION: ''}
+
+def compute_batch_output_paths(input_paths: List[str], output_directory: str, compression: str = NO_COMPRESSION) -> List[str]:
+    """Mirrors the directory structure of the input files below their common directory in the output directory"""
+    input_directory = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in input_paths])
+    extension = RECORD_FILE_EXTENSION + COMPRESSION_FILE_EXTENSIONS[compression]
+    return [os.path.join(output_directory, os.path.relpath(os.path.abspath(path), input_directory) + extension) for path in input_paths]
+
+def initialize_batch_worker():
+    #Loading the lexicon up front means every file a worker handles shares a single load
+    get_lexicon()
+
+def create_record_for_batch_file(input_path: str, output_path: str = None, *, spaces_per_tab: int, should_ignore_indentation: bool, engine: ParsingEngine, result_cache: ResultCache = None,
+                                 should_write_index: bool = False, compression: str = None):
+    """Returns the number of commands for the file and the record text if there is no output path to write the record to.
+        The number of commands is None for files that are not text.
+    """
+    options = {'spaces_per_tab': spaces_per_tab, 'should_ignore_indentation': should_ignore_indentation, 'engine': engine, 'result_cache': result_cache}
+    try:
+        if output_path is None:
+            return create_record_text_for_text_file(input_path, **options)
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+        return output_commands_for_text_file(input_path, output_path, **options, should_write_index=should_write_index, compression=compression), None
+    except UnicodeDecodeError:
+        if output_path is not None and os.path.exists(output_path):
+            os.remove(output_path)
+        return None, None
+
+BATCH_FILES_PER_TASK = 4
+
+def generate_batch_records(input_paths: List[str], output_paths: List[str], number_of_processes: int, **options):
+    """Yields the number of commands and record text for every input file in order, spreading the files across a pool of worker processes"""
+    create_record = functools.partial(create_record_for_batch_file, **options)
+    if number_of_processes <= 1:
+        initialize_batch_worker()
+        yield from map(create_record, input_paths, output_paths)
+        return
+    with ProcessPoolExecutor(number_of_processes, initializer=initialize_batch_worker) as executor:
+        yield from executor.map(create_record, input_paths, output_paths, chunksize=BATCH_FILES_PER_TASK)
 
-def output_command_history_to_file(command_history, file_path):
-    with open(file_path, 'w') as file:
-        for command in command_history:
-            record_command_to_file(command, file)
+def process_batch(directory_or_pattern: str, output_path: str, *, should_merge_records: bool, number_of_processes: int, should_write_index: bool = False,
+                  compression: str = None, **options):
+    """Creates a record for every file the directory or glob pattern refers to. The records either go into the output directory
+        with one record per input file or into a single record at the output path with recording starts separating the files.
+    """
+    start = time.perf_counter()
+    input_paths = find_batch_input_files(directory_or_pattern)
+    if not input_paths:
+        print("No input files found for " + directory_or_pattern)
+        return
+    if should_merge_records:
+        output_paths = [None]*len(input_paths)
+        merged_record_file = open_record_file(output_path, 'w', compression)
+    else:
+        output_paths = compute_batch_output_paths(input_paths, output_path, compression or NO_COMPRESSION)
+        merged_record_file = None
+        options['should_write_index'] = should_write_index
+        options['compression'] = compression
+    number_of_commands = 0
+    number_of_files = 0
+    try:
+        for input_path, (number_of_file_commands, record) in zip(input_paths, generate_batch_records(input_paths, output_paths, number_of_processes, **options)):
+            if number_of_file_commands is None:
+                print("Skipped " + input_path + " because it is not a text file.")
+                continue
+            if merged_record_file is not None:
+                if number_of_files > 0:
+                    merged_record_file.write(RECORDING_START_MESSAGE + '\n')
+                merged_record_file.write(record)
+            number_of_commands += number_of_file_commands
+            number_of_files += 1
+    finally:
+        if merged_record_file is not None:
+            merged_record_file.close()
+    if merged_record_file is not None and should_write_index:
+        write_record_index(output_path)
+    seconds = time.perf_counter() - start
+    print(f"Done. Generated histories with {number_of_commands} items for {number_of_files} files in {seconds:.2f} seconds ({number_of_files / seconds:.1f} files per second).")
 
 if __name__ == '__main__':
     argument_parser = argparse.ArgumentParser(description='Generates an artificial talon voice command history that could have generated the text in a text file')
@@ -34,12 +527,62 @@ if __name__ == '__main__':
     argument_parser.add_argument('output_file', type=str, help='The path for the file to output the artificial command history to')
     argument_parser.add_argument('-t', type=int, default=0, help='The number of spaces that represent a tab in the input file')
     argument_parser.add_argument('-i', help='Determines if indentation should be ignored.', action="store_true")
+    argument_parser.add_argument('-e', choices=list(PARSING_ENGINE_NAMES), default='greedy', help='The parsing engine to use. compatible-segmenting produces the same output as greedy '
+                                 'except that it ends candidates at 256 characters, so long runs of punctuation cannot make it slow.')
+    argument_parser.add_argument('-j', type=int, default=1, help='The number of processes to parse the text with. The text is split into chunks at new lines. In batch mode, the number of worker processes that files are spread across.')
+    argument_parser.add_argument('-b', help='Batch mode. The input is a directory or glob pattern and the output is a directory that gets a record for every input file.', action="store_true")
+    argument_parser.add_argument('-m', help='In batch mode, writes a single record to the output path with a recording start between the files.', action="store_true")
+    argument_parser.add_argument('-c', type=str, default=None, help='The directory of a cache of generated records. Inputs that were generated before with the same options are copied from the cache.')
+    argument_parser.add_argument('-s', type=int, default=DEFAULT_MAXIMUM_RESULT_CACHE_SIZE // (1 << 20), help='The size in megabytes the cache gets reduced to after generating by removing the least recently used records.')
+    argument_parser.add_argument('--clear-cache', help='Removes every record from the cache before generating.', action="store_true")
+    argument_parser.add_argument('-u', help='Incremental mode. Keeps an index next to the output so that the next run only parses the lines of the input that changed.', action="store_true")
+    argument_parser.add_argument('-f', choices=RECORD_FORMATS, default=TEXT_RECORD_FORMAT, help='The format of the output record. Binary records are smaller and faster to read with action_records.read_binary_file_record.')
+    argument_parser.add_argument('--convert', help='Converts the input record between the text and binary formats instead of generating a record.', action="store_true")
+    argument_parser.add_argument('-x', help='Writes a binary index of the command and recording start offsets next to every record for reading parts of the record without parsing all of it.', action="store_true")
+    argument_parser.add_argument('-z', choices=COMPRESSION_FORMATS, default=None,
+                                 help='The compression of the output record. By default, records whose path ends in .gz, .bz2, .xz or .lzma are compressed with the matching format.')
     arguments = argument_parser.parse_args()
+    if arguments.f == BINARY_RECORD_FORMAT and (arguments.b or arguments.u or arguments.x):
+        argument_parser.error('binary records can only be written for a single file without -u or -x')
+    if arguments.x and find_record_compression(arguments.output_file if not arguments.b or arguments.m else '', arguments.z) is not None:
+        argument_parser.error('compressed records cannot be indexed with -x')
+    if arguments.convert and arguments.z is not None:
+        argument_parser.error('the compression of converted records is decided by their extensions')
+    if arguments.convert and (arguments.t != 0 or arguments.i or arguments.e != 'greedy' or arguments.j != 1 or arguments.b or arguments.c is not None or arguments.u or arguments.x
+                              or arguments.f != TEXT_RECORD_FORMAT):
+        argument_parser.error('--convert only converts the input record, so the options for generating records cannot be used with it')
+    if arguments.u and (arguments.b or arguments.c is not None or arguments.j != 1):
+        argument_parser.error('incremental mode (-u) regenerates a single file on one process without the cache, so it cannot be used with -b, -c or -j')
+    if arguments.m and not arguments.b:
+        argument_parser.error('-m only applies to batch mode (-b)')
+    if arguments.c is None and (arguments.clear_cache or arguments.s != DEFAULT_MAXIMUM_RESULT_CACHE_SIZE // (1 << 20)):
+        argument_parser.error('-s and --clear-cache only apply to a cache directory given with -c')
     input_path = arguments.input_file
     output_path = arguments.output_file
     spaces_per_tab = arguments.t
     should_ignore_indentation = arguments.i
+    engine = PARSING_ENGINE_NAMES[arguments.e]
+    number_of_processes = arguments.j
+    result_cache = None
+    if arguments.c is not None:
+        result_cache = ResultCache(arguments.c, arguments.s * (1 << 20))
+        if arguments.clear_cache:
+            result_cache.clear()
     print("Starting...")
-    command_history = create_command_history_list_from_text_file(input_path, spaces_per_tab, should_ignore_indentation=should_ignore_indentation)
-    output_command_history_to_file(command_history, output_path)
-    print("Done. Generated a history with " + str(len(command_history)) + " items.")
\ No newline at end of file
+    if arguments.convert:
+        number_of_records = convert_record(input_path, output_path)
+        print("Done. Converted a history with " + str(number_of_records) + " items.")
+    elif arguments.b:
+        process_batch(input_path, output_path, should_merge_records=arguments.m, number_of_processes=number_of_processes, should_write_index=arguments.x, compression=arguments.z,
+                      spaces_per_tab=spaces_per_tab, should_ignore_indentation=should_ignore_indentation, engine=engine, result_cache=result_cache)
+    elif arguments.u:
+        number_of_commands, number_of_parsed_lines = regenerate_record_incrementally(input_path, output_path, spaces_per_tab, should_ignore_indentation=should_ignore_indentation, engine=engine,
+                                                                                     should_write_index=arguments.x, compression=arguments.z)
+        print("Done. Generated a history with " + str(number_of_commands) + " items after parsing " + str(number_of_parsed_lines) + " changed lines.")
+    else:
+        number_of_commands = output_commands_for_text_file(input_path, output_path, spaces_per_tab, should_ignore_indentation=should_ignore_indentation,
+                                                           engine=engine, number_of_processes=number_of_processes, result_cache=result_cache, should_write_index=arguments.x,
+                                                           record_format=arguments.f, compression=arguments.z)
+        print("Done. Generated a history with " + str(number_of_commands) + " items.")
+    if result_cache is not None:
+        result_cache.evict()
\ No newline at end of file
@@ -1,8 +1,10 @@
 from typing import Callable
 from typing import List
 from action_records import Command, BasicAction
+from lexicon import Lexicon, get_lexicon
+from bounded_cache import BoundedCache
 from enum import Enum
-import os
+import functools
 
 class PatternMatcher:
     def does_belong_to_pattern(self, current_match: str, next_character: str) -> bool:
@@ -32,24 +34,45 @@ class SingleCharacterPatternMatcher(PatternMatcher):
         return self.name
 
 class WordPatternMatcher(PatternMatcher):
-    def __init__(self, word_set, maximum_word_length):
-        self.word_set = word_set
-        self.maximum_word_length = maximum_word_length
+    """Detects a single word. The lexicon is only loaded once the matcher is first used."""
+    def __init__(self, load_lexicon: Callable[[], Lexicon] = get_lexicon):
+        self.load_lexicon = load_lexicon
+        self.lexicon = None
+
+    def _get_lexicon(self) -> Lexicon:
+        if self.lexicon is None:
+            self.lexicon = self.load_lexicon()
+        return self.lexicon
+
+    def get_maximum_word_length(self) -> int:
+        return self._get_lexicon().get_maximum_word_length()
 
     def does_belong_to_pattern(self, current_match: str, next_character: str) -> bool:
         total_match = current_match + next_character
-        return total_match in self.word_set
+        return self._get_lexicon().is_word(total_match)
     
+    def _is_made_of_word_characters(self, text: str) -> bool:
+        for character in text:
+            if not (character.isalpha() or character == "'"):
+                return False
+        return True
+
     def could_potentially_belong_to_pattern(self, current_match: str, next_character: str, is_end_of_text: bool = False) -> bool:
-        if not next_character.isalpha() or self.maximum_word_length < len(current_match) + 1:
+        if not next_character.isalpha() or self.get_maximum_word_length() < len(current_match) + 1:
             return False
         if is_end_of_text:
             return self.does_belong_to_pattern(current_match, next_character)
         total_match = current_match + next_character
-        for character in total_match:
-            if not (character.isalpha() or character == "'"):
-                return False
-        return True
+        return self._is_made_of_word_characters(total_match) and self._get_lexicon().could_be_start_of_word(total_match.lower())
+
+    def is_start_of_word(self, text: str) -> bool:
+        return self._get_lexicon().could_be_start_of_word(text.lower())
+
+    def could_potentially_be_words_smashed_together(self, text: str) -> bool:
+        """Determines if the text could be the start of a series of words with no separator between them"""
+        if not text[-1].isalpha() or self.get_maximum_word_length() < len(text):
+            return False
+        return self._is_made_of_word_characters(text) and self._get_lexicon().could_be_start_of_words_smashed_together(text.lower())
     
     def get_name(self) -> str:
         return "word"
@@ -122,47 +145,62 @@ def compute_case_format_for_words(words: List[str]) -> CaseFormat:
 
 def compute_sub_words(text: str, is_word) -> List[str]:
     words = []
-    current_word = ""
-    for character in text:
-        current_word += character
+    for ending_index in range(1, len(text) + 1):
+        current_word = text[:ending_index]
         if is_word(current_word) and compute_casing_of_word(current_word) != Casing.OTHER:
-            words.append(current_word[:])
+            words.append(current_word)
     return words
 
 def compute_best_separation_of_words_smashed_together_given_words_at_starting_index(
     words: str,
     is_word,
     current_word_start: int, 
-    words_starting_at_index: List[str]
+    words_starting_at_index: List[str],
+    separations_starting_at_index: dict = None
     ):
+    if separations_starting_at_index is None:
+        separations_starting_at_index = {}
     for i in range(len(words_starting_at_index) - 1, -1, -1):
         word = words_starting_at_index[i]
         ending_index = current_word_start + len(word)
         if ending_index == len(words):
             return [word]
         else:
-            remaining_words = separate_words_smashed_together(words, is_word, ending_index)
+            remaining_words = separate_words_smashed_together(words, is_word, ending_index, separations_starting_at_index)
             if remaining_words and compute_case_format_for_words([word] + remaining_words) != CaseFormat.OTHER:
                 return [word] + remaining_words
             else:
                 continue
     return None
 
-def separate_words_smashed_together(words: str, is_word, current_word_start: int = 0) -> List[str]:
-    remaining_text = words[current_word_start:]
-    words_starting_at_index = compute_sub_words(remaining_text, is_word)
-    if words_starting_at_index:
-        return compute_best_separation_of_words_smashed_together_given_words_at_starting_index(
-            words, is_word, current_word_start, words_starting_at_index
-        )
+def separate_words_smashed_together(words: str, is_word, current_word_start: int = 0, separations_starting_at_index: dict = None) -> List[str]:
+    """Separates the text into words preferring the longest possible first word.
+        The best separation of every suffix only depends on where the suffix starts,
+        so it is remembered to avoid recomputing it for every way of reaching that index.
+    """
+    if separations_starting_at_index is None:
+        separations_starting_at_index = {}
+    if current_word_start in separations_starting_at_index:
+        separation = separations_starting_at_index[current_word_start]
     else:
+        remaining_text = words[current_word_start:]
+        words_starting_at_index = compute_sub_words(remaining_text, is_word)
+        if words_starting_at_index:
+            separation = compute_best_separation_of_words_smashed_together_given_words_at_starting_index(
+                words, is_word, current_word_start, words_starting_at_index, separations_starting_at_index
+            )
+        else:
+            separation = None
+        separations_starting_at_index[current_word_start] = separation
+    if separation is None:
         return None
+    return separation[:]
 
 
 class InvalidFormattedWordsTextException(Exception): pass
 
 
-def separate_potentially_formatted_words_into_tokens(text: str, is_word) -> List[str]:
+def separate_text_into_alphabetic_and_non_alphabetic_tokens(text: str) -> List[str]:
     tokens = []
     current_token = ""
     is_alphabetic_token = False
@@ -177,13 +215,126 @@ def separate_potentially_formatted_words_into_tokens(text: str, is_word) -> List
             current_token = character
             is_alphabetic_token = is_alphabetic_character
     tokens.append(current_token)
+    return tokens
+
+def separate_potentially_formatted_words_into_tokens(text: str, is_word) -> List[str]:
+    tokens = separate_text_into_alphabetic_and_non_alphabetic_tokens(text)
     if len(tokens) == 1 and not is_word(tokens[0]):
         tokens = separate_words_smashed_together(text, is_word)
         if not tokens:
             raise InvalidFormattedWordsTextException
     return tokens
 
+class SmashedWordsLattice:
+    """The words in a series of characters with no separator, found one character at a time.
+        Only a position that a chain of words from the start reaches can begin another word, and only the starts
+        whose text so far is the start of a word can still become one, so a new character needs lexicon lookups for just those starts.
+    """
+    __slots__ = ('text', 'word_starts_ending_at', 'growing_word_starts')
+
+    def __init__(self, text: str = "", word_starts_ending_at: tuple = ((),), growing_word_starts: tuple = ()):
+        self.text = text
+        self.word_starts_ending_at = word_starts_ending_at
+        self.growing_word_starts = growing_word_starts
+
+    def create_extension(self, character: str, is_word, is_start_of_word):
+        text = self.text + character
+        starts = self.growing_word_starts
+        if len(self.text) == 0 or self.word_starts_ending_at[-1]:
+            starts += (len(self.text),)
+        growing_word_starts = []
+        word_starts = []
+        for start in starts:
+            potential_word = text[start:]
+            if is_start_of_word(potential_word):
+                growing_word_starts.append(start)
+                if is_word(potential_word):
+                    word_starts.append(start)
+        return SmashedWordsLattice(text, self.word_starts_ending_at + (tuple(word_starts),), tuple(growing_word_starts))
+
+    def could_be_start_of_words_smashed_together(self) -> bool:
+        """Determines if the text could be a series of words followed by the start of another word"""
+        return len(self.growing_word_starts) > 0
+
+    def separate_words(self) -> List[str]:
+        """Returns the same separation as separate_words_smashed_together without looking up any more words"""
+        text = self.text
+        word_ends_starting_at = [[] for _ in range(len(text) + 1)]
+        for end in range(1, len(text) + 1):
+            for start in self.word_starts_ending_at[end]:
+                if compute_casing_of_word(text[start:end]) != Casing.OTHER:
+                    word_ends_starting_at[start].append(end)
+        separations_starting_at = [None]*(len(text) + 1)
+        for start in range(len(text) - 1, -1, -1):
+            for end in reversed(word_ends_starting_at[start]):
+                word = text[start:end]
+                if end == len(text):
+                    separations_starting_at[start] = [word]
+                    break
+                remaining_words = separations_starting_at[end]
+                if remaining_words and compute_case_format_for_words([word] + remaining_words) != CaseFormat.OTHER:
+                    separations_starting_at[start] = [word] + remaining_words
+                    break
+        return separations_starting_at[0] if text else None
+
 MAXIMUM_NUMBER_OF_WORDS_PER_UTTERANCE = 7
+MAXIMUM_NUMBER_OF_REMEMBERED_FORMATTED_WORDS_CANDIDATES = 1 << 12
+
+class FormattedWordsCandidate:
+    """The alphabetic and non alphabetic tokens of a formatted words candidate.
+        The tokens of the candidate extended by a character are computed from these
+        and the validity of the leading tokens carries over, so only the newest token needs work.
+        While the candidate is a single token, the words smashed together in it are carried over the same way.
+    """
+    def __init__(self, tokens: List[str]):
+        self.tokens = tokens
+        self.number_of_validated_leading_tokens = 0
+        self.are_validated_leading_tokens_valid = False
+        self.previous_candidate = None
+        self.smashed_words_lattice = None
+
+    def get_tokens(self) -> List[str]:
+        return self.tokens
+
+    def create_extension(self, character: str):
+        last_token = self.tokens[-1]
+        if last_token and last_token[-1].isalpha() == character.isalpha():
+            tokens = self.tokens[:-1] + [last_token + character]
+        else:
+            tokens = self.tokens + [character]
+        extension = FormattedWordsCandidate(tokens)
+        if len(tokens) == 1:
+            extension.previous_candidate = self
+        #Every token except the last one is unchanged in the extension
+        if self.number_of_validated_leading_tokens < len(self.tokens):
+            extension.number_of_validated_leading_tokens = self.number_of_validated_leading_tokens
+            extension.are_validated_leading_tokens_valid = self.are_validated_leading_tokens_valid
+        return extension
+
+    def get_validity_of_leading_tokens(self, number_of_tokens: int):
+        if number_of_tokens == self.number_of_validated_leading_tokens:
+            return self.are_validated_leading_tokens_valid
+        return None
+
+    def set_validity_of_leading_tokens(self, number_of_tokens: int, is_valid: bool):
+        self.number_of_validated_leading_tokens = number_of_tokens
+        self.are_validated_leading_tokens_valid = is_valid
+
+    def get_smashed_words_lattice(self, is_word, is_start_of_word) -> SmashedWordsLattice:
+        """Returns the lattice of the words in the only token, extending the lattice of the nearest shorter candidate that has one"""
+        if self.smashed_words_lattice is None:
+            candidates_without_lattice = []
+            candidate = self
+            while candidate is not None and candidate.smashed_words_lattice is None:
+                candidates_without_lattice.append(candidate)
+                candidate = candidate.previous_candidate
+            lattice = SmashedWordsLattice() if candidate is None else candidate.smashed_words_lattice
+            for candidate in reversed(candidates_without_lattice):
+                for character in candidate.tokens[0][len(lattice.text):]:
+                    lattice = lattice.create_extension(character, is_word, is_start_of_word)
+                candidate.smashed_words_lattice = lattice
+                candidate.previous_candidate = None
+        return self.smashed_words_lattice
 
 class FormattedWordsPatternMatcher(PatternMatcher):
     SEPARATORS_TO_FORMATTER_NAME = {
@@ -197,10 +348,34 @@ class FormattedWordsPatternMatcher(PatternMatcher):
     """Detects a series of formatted words"""
     def __init__(self, word_pattern_matcher: WordPatternMatcher):
         self.word_pattern_matcher = word_pattern_matcher
+        self.candidates = BoundedCache(MAXIMUM_NUMBER_OF_REMEMBERED_FORMATTED_WORDS_CANDIDATES)
     
     def _is_text_a_word(self, text: str) -> bool:
         return self.word_pattern_matcher.does_belong_to_pattern(text.lower(), "")
 
+    def _get_candidate(self, current_match: str, next_character: str) -> FormattedWordsCandidate:
+        total_text = current_match + next_character
+        candidate = self.candidates.get(total_text)
+        if candidate is None:
+            previous_candidate = self.candidates.get(current_match)
+            if previous_candidate is not None and current_match and next_character:
+                candidate = previous_candidate.create_extension(next_character)
+            else:
+                candidate = FormattedWordsCandidate(separate_text_into_alphabetic_and_non_alphabetic_tokens(total_text))
+            self.candidates.remember(total_text, candidate)
+        return candidate
+
+    def _get_smashed_words_lattice(self, candidate: FormattedWordsCandidate) -> SmashedWordsLattice:
+        return candidate.get_smashed_words_lattice(self._is_text_a_word, self.word_pattern_matcher.is_start_of_word)
+
+    def _compute_tokens(self, candidate: FormattedWordsCandidate) -> List[str]:
+        tokens = candidate.get_tokens()
+        if len(tokens) == 1 and not self._is_text_a_word(tokens[0]):
+            tokens = self._get_smashed_words_lattice(candidate).separate_words()
+            if not tokens:
+                raise InvalidFormattedWordsTextException
+        return tokens
+
     def _do_tokens_belong_to_pattern_with_separator(self, tokens: List[str], separator: str) -> bool:
         expecting_word = True
         words = []
@@ -243,7 +418,7 @@ class FormattedWordsPatternMatcher(PatternMatcher):
 
     def does_belong_to_pattern(self, current_match: str, next_character: str) -> bool:
         try:
-            tokens = separate_potentially_formatted_words_into_tokens(current_match + next_character, self._is_text_a_word)
+            tokens = self._compute_tokens(self._get_candidate(current_match, next_character))
         except InvalidFormattedWordsTextException:
             return False
         return self._do_tokens_belong_to_pattern(tokens)
@@ -266,11 +441,14 @@ class FormattedWordsPatternMatcher(PatternMatcher):
         total_text = current_match + next_character
         if is_end_of_text:
             return self.does_belong_to_pattern(current_match, next_character)
+        candidate = self._get_candidate(current_match, next_character)
         try:
-            tokens = separate_potentially_formatted_words_into_tokens(total_text, self._is_text_a_word)
+            tokens = self._compute_tokens(candidate)
         except InvalidFormattedWordsTextException:
             #This branch is usually reached by a single series of alphabetic characters with no separator
-            return self._could_potentially_be_start_of_word(total_text)
+            if len(candidate.get_tokens()) != 1 or not next_character.isalpha() or self.word_pattern_matcher.get_maximum_word_length() < len(total_text):
+                return self.word_pattern_matcher.could_potentially_be_words_smashed_together(total_text)
+            return self._get_smashed_words_lattice(candidate).could_be_start_of_words_smashed_together()
         last_token = tokens[-1]
         is_last_token_separator = self._is_token_start_of_separator(last_token)
         if not is_last_token_separator and not self._could_potentially_be_start_of_word(last_token):
@@ -286,7 +464,12 @@ class FormattedWordsPatternMatcher(PatternMatcher):
             presumably_properly_formed_formatted_words_ending_index -= 1
         if presumably_properly_formed_formatted_words_ending_index == 1:
             return self._is_text_a_word(tokens[0])
-        return self._do_tokens_belong_to_pattern(tokens[:presumably_properly_formed_formatted_words_ending_index])
+        #Words smashed together never get here because their last two tokens are words, so the tokens are the candidate tokens
+        are_leading_tokens_valid = candidate.get_validity_of_leading_tokens(presumably_properly_formed_formatted_words_ending_index)
+        if are_leading_tokens_valid is None:
+            are_leading_tokens_valid = self._do_tokens_belong_to_pattern(tokens[:presumably_properly_formed_formatted_words_ending_index])
+            candidate.set_validity_of_leading_tokens(presumably_properly_formed_formatted_words_ending_index, are_leading_tokens_valid)
+        return are_leading_tokens_valid
 
     def get_name(self) -> str:
         return "formatted words"
@@ -366,29 +549,59 @@ def are_tokens_valid_prose_tokens(tokens: List[str], is_a_word: Callable[[str],
             return False
     return True
 
+MAXIMUM_NUMBER_OF_REMEMBERED_COMPLETED_PROSE_TEXTS = 1 << 12
+
 class ProsePatternMatcher(PatternMatcher):
+    """Detects prose. Every token before the last space of a candidate is complete,
+        so whether those tokens are valid is remembered by the text they make up
+        and only the last token needs to be examined as the candidate grows.
+    """
     def __init__(self, word_pattern_matcher: WordPatternMatcher):
         self.word_pattern_matcher = word_pattern_matcher
+        self.completed_texts = BoundedCache(MAXIMUM_NUMBER_OF_REMEMBERED_COMPLETED_PROSE_TEXTS)
 
     def _is_text_a_word(self, text: str) -> bool:
         return self.word_pattern_matcher.does_belong_to_pattern(text.lower(), "")
 
+    def _compute_number_and_validity_of_completed_tokens(self, text: str):
+        """Returns the number of tokens before the last space and whether they are all valid prose tokens"""
+        unvalidated_token_ends = []
+        token_end = text.rfind(" ")
+        number_of_tokens, are_tokens_valid = 0, True
+        while token_end != -1:
+            remembered_answer = self.completed_texts.get(text[:token_end])
+            if remembered_answer is not None:
+                number_of_tokens, are_tokens_valid = remembered_answer
+                break
+            unvalidated_token_ends.append(token_end)
+            token_end = text.rfind(" ", 0, token_end)
+        token_start = token_end + 1
+        for token_end in reversed(unvalidated_token_ends):
+            number_of_tokens += 1
+            are_tokens_valid = are_tokens_valid and number_of_tokens <= MAXIMUM_NUMBER_OF_WORDS_PER_UTTERANCE and \
+                is_valid_prose_token(text[token_start:token_end], self._is_text_a_word)
+            self.completed_texts.remember(text[:token_end], (number_of_tokens, are_tokens_valid))
+            token_start = token_end + 1
+        return number_of_tokens, are_tokens_valid
+
     def does_belong_to_pattern(self, current_match: str, next_character: str) -> bool:
         total_text = current_match + next_character
-        tokens = total_text.split(" ")
-        return len(tokens) <= MAXIMUM_NUMBER_OF_WORDS_PER_UTTERANCE and len(tokens) > 1 and \
-                are_tokens_valid_prose_tokens(tokens, self._is_text_a_word)
+        number_of_completed_tokens, are_completed_tokens_valid = self._compute_number_and_validity_of_completed_tokens(total_text)
+        number_of_tokens = number_of_completed_tokens + 1
+        return number_of_tokens <= MAXIMUM_NUMBER_OF_WORDS_PER_UTTERANCE and number_of_tokens > 1 and \
+                are_completed_tokens_valid and is_valid_prose_token(total_text[total_text.rfind(" ") + 1:], self._is_text_a_word)
 
     def could_potentially_belong_to_pattern(self, current_match: str, next_character: str, is_end_of_text: bool = False) -> bool:
         if next_character == " " and current_match and not is_end_of_text and not current_match.endswith(" "):
             return self.could_potentially_belong_to_pattern(current_match[:-1], current_match[-1], is_end_of_text)
         total_text = current_match + next_character
-        tokens = total_text.split(" ")
-        if len(tokens) > MAXIMUM_NUMBER_OF_WORDS_PER_UTTERANCE or \
-            (len(tokens) > 1 and not are_tokens_valid_prose_tokens(tokens[:-1], self._is_text_a_word)) or \
-            len(tokens) == 1 and is_end_of_text:
+        number_of_completed_tokens, are_completed_tokens_valid = self._compute_number_and_validity_of_completed_tokens(total_text)
+        number_of_tokens = number_of_completed_tokens + 1
+        if number_of_tokens > MAXIMUM_NUMBER_OF_WORDS_PER_UTTERANCE or \
+            (number_of_tokens > 1 and not are_completed_tokens_valid) or \
+            number_of_tokens == 1 and is_end_of_text:
             return False
-        last_token = tokens[-1]
+        last_token = total_text[total_text.rfind(" ") + 1:]
         alphabetic_characters, punctuation = compute_alphabetic_characters_and_punctuation_for_prose_token(last_token)
         if punctuation and not is_every_punctuation_character_supported_by_prose_commands(punctuation):
             return False
@@ -402,23 +615,13 @@ class ProsePatternMatcher(PatternMatcher):
     def get_priority(self) -> int:
         return 3
 
-def load_words_from_text():
-    current_directory = os.path.dirname(__file__)
-    resources_directory = os.path.join(current_directory, 'resources')
-    words_file_path = os.path.join(resources_directory, 'words.txt')
-    with open(words_file_path, 'r') as words_file:
-        words = words_file.read().splitlines()
-    words = set(words)
-    return words
-
-def compute_maximum_text_length_from_set(input_set):
-    max_length = 0
-    for word in input_set:
-        max_length = max(max_length, len(word))
-    return max_length
-
-WORDS = load_words_from_text()
-MAXIMUM_WORD_LENGTH = compute_maximum_text_length_from_set(WORDS)
+def __getattr__(name: str):
+    #The word list is loaded on first use so that importing this module stays cheap
+    if name == 'WORDS':
+        return get_lexicon()
+    if name == 'MAXIMUM_WORD_LENGTH':
+        return get_lexicon().get_maximum_word_length()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 #Based largely on talon's community repository
 SYMBOLS_TO_SPOKEN_FORM = {
@@ -544,7 +747,7 @@ def create_tab_pattern_matcher():
     return SingleCharacterPatternMatcher(is_valid_character, "tab")
 
 def create_word_pattern_matcher():
-    return WordPatternMatcher(WORDS, MAXIMUM_WORD_LENGTH)
+    return WordPatternMatcher()
 
 def create_formatted_words_pattern_matcher():
     word_pattern_matcher = create_word_pattern_matcher()
@@ -580,7 +783,7 @@ def create_word_command(total_matching_text: str):
     return command
 
 def create_formatted_words_command(total_matching_text: str):
-    tokens = separate_potentially_formatted_words_into_tokens(total_matching_text, is_word=lambda x: x.lower() in WORDS)
+    tokens = separate_potentially_formatted_words_into_tokens(total_matching_text, is_word=lambda x: get_lexicon().is_word(x.lower()))
     separator = ""
     if tokens[1] in FormattedWordsPatternMatcher.SEPARATORS_TO_FORMATTER_NAME:
         separator = tokens[1]
@@ -671,8 +874,51 @@ NAMES_TO_ACTION_CREATION_FUNCTIONS = {
     "tab": create_tab_command,
 }
 
+#Creating these commands tokenizes the text again, which costs several times as much as copying a command created before
+NAMES_OF_PATTERNS_WITH_MEMOIZED_COMMANDS = {"formatted words", "prose"}
+MAXIMUM_NUMBER_OF_MEMOIZED_COMMANDS = 1 << 14
+
+@functools.lru_cache(maxsize=MAXIMUM_NUMBER_OF_MEMOIZED_COMMANDS)
+def _create_memoized_command(name: str, total_matching_text: str) -> Command:
+    return NAMES_TO_ACTION_CREATION_FUNCTIONS[name](total_matching_text)
+
+def copy_memoized_command(command: Command) -> Command:
+    """Copies a memoized command including its actions and their arguments, so that changing the copy can never change the memo"""
+    return Command(command.get_name(), [BasicAction(action.get_name(), action.get_arguments()[:]) for action in command.get_actions()])
+
+class CommandMemoStatistics:
+    def __init__(self, number_of_hits: int, number_of_misses: int, number_of_memoized_commands: int):
+        self.number_of_hits = number_of_hits
+        self.number_of_misses = number_of_misses
+        self.number_of_memoized_commands = number_of_memoized_commands
+
+    def get_number_of_hits(self) -> int:
+        return self.number_of_hits
+
+    def get_number_of_misses(self) -> int:
+        return self.number_of_misses
+
+    def compute_hit_rate(self) -> float:
+        total = self.number_of_hits + self.number_of_misses
+        if total == 0:
+            return 0.0
+        return self.number_of_hits / total
+
+    def __str__(self):
+        return f"{self.number_of_hits} of {self.number_of_hits + self.number_of_misses} commands reused ({self.compute_hit_rate():.1%} hit rate), {self.number_of_memoized_commands} remembered"
+
+def get_command_memo_statistics() -> CommandMemoStatistics:
+    information = _create_memoized_command.cache_info()
+    return CommandMemoStatistics(information.hits, information.misses, information.currsize)
+
+def clear_command_memo():
+    _create_memoized_command.cache_clear()
+
 def create_command_from_pattern_matcher(pattern_matcher: PatternMatcher, total_matching_text: str) -> Command:
+    """Creates the command for the text the pattern matcher matched. Every call returns a new command that can be changed freely."""
     name = pattern_matcher.get_name()
+    if name in NAMES_OF_PATTERNS_WITH_MEMOIZED_COMMANDS:
+        return copy_memoized_command(_create_memoized_command(name, total_matching_text))
     action_creation_function = NAMES_TO_ACTION_CREATION_FUNCTIONS[name]
     command = action_creation_function(total_matching_text)
     return command
\ No newline at end of file
@@ -0,0 +1,131 @@
+from lexicon import WORDS_FILE_PATH, compute_file_hash
+import hashlib
+import os
+import shutil
+
+CURRENT_DIRECTORY = os.path.dirname(__file__)
+#Changes to any of these can change the generated records, so their contents are part of every cache key.
+#This has to name every module of the repository that main imports.
+GENERATOR_SOURCE_FILE_PATHS = [os.path.join(CURRENT_DIRECTORY, name) for name in [
+    'action_records.py', 'bounded_cache.py', 'lexicon.py', 'patterns.py', 'result_cache.py', 'text_parsing.py', 'main.py',
+]]
+RESULT_CACHE_FORMAT_VERSION = 1
+DEFAULT_MAXIMUM_RESULT_CACHE_SIZE = 1 << 30
+RECORD_ENTRY_EXTENSION = '.record'
+INPUT_HASHING_BLOCK_SIZE = 1 << 20
+
+_generator_version = None
+
+def compute_generator_version() -> str:
+    """Returns a hash of the word list and the generator sources that changes whenever either of them does"""
+    global _generator_version
+    if _generator_version is None:
+        version_hash = hashlib.sha256(str(RESULT_CACHE_FORMAT_VERSION).encode('utf-8'))
+        for path in [WORDS_FILE_PATH] + GENERATOR_SOURCE_FILE_PATHS:
+            version_hash.update(compute_file_hash(path))
+        _generator_version = version_hash.hexdigest()
+    return _generator_version
+
+class ResultCache:
+    """Stores generated records on disk keyed by a hash of the input file contents, the options and the generator version.
+        Entries that have not been used recently are evicted once the cache grows past its maximum size.
+    """
+    def __init__(self, directory: str, maximum_size: int = DEFAULT_MAXIMUM_RESULT_CACHE_SIZE):
+        self.directory = directory
+        self.maximum_size = maximum_size
+
+    def compute_key(self, input_path: str, **options) -> str:
+        key_hash = hashlib.sha256(compute_generator_version().encode('utf-8'))
+        for name in sorted(options):
+            key_hash.update(f'{name}={options[name]}\n'.encode('utf-8'))
+        with open(input_path, 'rb') as file:
+            block = file.read(INPUT_HASHING_BLOCK_SIZE)
+            while block:
+                key_hash.update(block)
+                block = file.read(INPUT_HASHING_BLOCK_SIZE)
+        return key_hash.hexdigest()
+
+    def _compute_entry_path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + RECORD_ENTRY_EXTENSION)
+
+    def _find_entry(self, key: str) -> str:
+        entry_path = self._compute_entry_path(key)
+        try:
+            #Touching the entry keeps recently used entries from being evicted
+            os.utime(entry_path)
+        except OSError:
+            return None
+        return entry_path
+
+    def copy_entry(self, key: str, output_path: str) -> bool:
+        """Copies the record for the key to the output path, returning False if there is no such record"""
+        entry_path = self._find_entry(key)
+        if entry_path is None:
+            return False
+        try:
+            shutil.copyfile(entry_path, output_path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def read_entry(self, key: str) -> str:
+        """Returns the record for the key or None if there is no such record"""
+        entry_path = self._find_entry(key)
+        if entry_path is None:
+            return None
+        try:
+            with open(entry_path, 'r', encoding='utf-8', newline='\n') as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    def _store(self, key: str, write_entry):
+        entry_path = self._compute_entry_path(key)
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        #Writing to a temporary file first means other processes never see a partially written entry
+        temporary_path = entry_path + '.tmp' + str(os.getpid())
+        write_entry(temporary_path)
+        os.replace(temporary_path, entry_path)
+
+    def store_file(self, key: str, record_path: str):
+        self._store(key, lambda entry_path: shutil.copyfile(record_path, entry_path))
+
+    def store_text(self, key: str, record: str):
+        def write_entry(entry_path: str):
+            with open(entry_path, 'w', encoding='utf-8', newline='\n') as file:
+                file.write(record)
+        self._store(key, write_entry)
+
+    def _list_entries(self):
+        entries = []
+        for directory, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith(RECORD_ENTRY_EXTENSION):
+                    path = os.path.join(directory, name)
+                    try:
+                        status = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    entries.append((status.st_mtime, status.st_size, path))
+        return entries
+
+    def evict(self):
+        """Removes the least recently used entries until the cache fits in its maximum size"""
+        entries = self._list_entries()
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.maximum_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+
+    def clear(self):
+        """Removes every entry, which is useful after changing the generator in ways the cache keys do not capture"""
+        for _, _, path in self._list_entries():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
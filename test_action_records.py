@@ -0,0 +1,319 @@
+from action_records import BasicAction, BasicActionEncoder, TalonCapture, Command, CommandChain, CommandHistory, RecordingStart, \
+    read_file_record, iter_file_record, read_file_record_in_parallel, split_record_file_into_ranges, \
+    read_file_record_range, read_recording_segment, write_record_index, get_record_index, RecordIndex, compute_record_index_path, \
+    read_binary_file_record, iter_binary_file_record, BinaryRecordEncoder, COMPRESSION_EXTENSIONS, open_record_file
+import action_records
+from main import output_command_history_to_file, output_commands_to_file, output_commands_to_binary_file, output_records_to_text_file
+import os
+import subprocess
+import sys
+import tempfile
+import json
+import unittest
+
+def compute_json_with_general_encoder(action: BasicAction) -> str:
+    return json.dumps({'name': action.get_name(), 'arguments': action.get_arguments()}, cls = BasicActionEncoder)
+
+class BasicActionJsonTestCase(unittest.TestCase):
+    def _assert_json_matches_general_encoder(self, action: BasicAction):
+        self.assertEqual(action.to_json(), compute_json_with_general_encoder(action))
+
+    def test_matches_general_encoder_for_string_arguments(self):
+        for text in ["test", "", "'quoted' \"text\"", "back\\slash", "new\nline\ttab", "café \U0001F600", "\x00\x1f\x7f"]:
+            self._assert_json_matches_general_encoder(BasicAction('insert', [text]))
+        self._assert_json_matches_general_encoder(BasicAction('key', ['ctrl-c', 'enter']))
+        self._assert_json_matches_general_encoder(BasicAction('edit.undo', []))
+
+    def test_matches_general_encoder_for_other_arguments(self):
+        for arguments in [[1], [True, None], [1.5, 'text'], [TalonCapture('letter', 1)]]:
+            self._assert_json_matches_general_encoder(BasicAction('user.action', arguments))
+
+    def test_round_trips(self):
+        action = BasicAction('insert', ["some \"text\"\n"])
+        self.assertEqual(BasicAction.from_json(action.to_json()), action)
+
+class CommandTestCase(unittest.TestCase):
+    def test_has_no_instance_dictionaries(self):
+        for record in [BasicAction('insert', ['text']), TalonCapture('letter', 1), Command('word text', [BasicAction('insert', ['text'])])]:
+            self.assertFalse(hasattr(record, '__dict__'))
+
+    def test_single_action_commands_behave_like_other_commands(self):
+        action = BasicAction('insert', ['text'])
+        command = Command('word text', [action])
+        self.assertEqual(command.get_actions(), [action])
+        self.assertTrue(command.has_same_actions_as(command.copy()))
+        command.actions.append(BasicAction('key', ['enter']))
+        self.assertEqual(len(command.get_actions()), 2)
+        command.get_actions().append(BasicAction('key', ['tab']))
+        self.assertEqual(len(command.get_actions()), 3)
+
+    def test_keeps_the_actions_list_it_is_given(self):
+        actions = [BasicAction('insert', ['text'])]
+        command = Command('word text', actions)
+        self.assertIs(command.get_actions(), actions)
+        self.assertIs(command.get_actions(), command.actions)
+        actions.append(BasicAction('key', ['enter']))
+        self.assertEqual(len(command.get_actions()), 2)
+
+    def test_chains_commands(self):
+        chain = CommandChain(None, [])
+        chain.append_command(Command('word this', [BasicAction('insert', ['this'])]))
+        chain.append_command(Command('enter', [BasicAction('key', ['enter'])]))
+        self.assertEqual(chain.get_name(), 'word this enter')
+        self.assertEqual(chain.get_actions(), [BasicAction('insert', ['this']), BasicAction('key', ['enter'])])
+        self.assertEqual(chain.get_size(), 2)
+
+def create_test_records():
+    return [
+        Command('word this', [BasicAction('insert', ['this'])], 3),
+        Command('enter', [BasicAction('key', ['enter'])]),
+        RecordingStart(),
+        Command('word this', [BasicAction('insert', ['this']), BasicAction('user.action', [1, True, None, TalonCapture('letter', 1)])]),
+        Command('nothing', []),
+    ]
+
+def assert_records_match(assertion_class, actual, expected):
+    assertion_class.assertEqual(len(actual), len(expected))
+    for actual_record, expected_record in zip(actual, expected):
+        assertion_class.assertEqual(actual_record.is_command_record(), expected_record.is_command_record())
+        if expected_record.is_command_record():
+            assertion_class.assertEqual(actual_record.get_name(), expected_record.get_name())
+            assertion_class.assertEqual(actual_record.get_actions(), expected_record.get_actions())
+            assertion_class.assertEqual(actual_record.get_seconds_since_action(), expected_record.get_seconds_since_action())
+
+class CommandHistoryTestCase(unittest.TestCase):
+    def test_stores_records(self):
+        records = create_test_records()
+        history = CommandHistory(records)
+        assert_records_match(self, list(history), records)
+        assert_records_match(self, [history[i] for i in range(-len(records), len(records))], records + records)
+        with self.assertRaises(IndexError):
+            history[len(records)]
+
+    def test_slices(self):
+        records = create_test_records()
+        history = CommandHistory(records)
+        for history_slice in [slice(1, 4), slice(None, None, 2), slice(-2, None), slice(3, 1)]:
+            assert_records_match(self, history[history_slice], records[history_slice])
+
+    def test_shares_repeated_strings(self):
+        history = CommandHistory(create_test_records())
+        history.append(Command('word this', [BasicAction('insert', ['this'])]))
+        self.assertEqual(len(history.command_names), 3)
+        self.assertEqual(len(history.action_names), 3)
+
+    def test_reads_record_files(self):
+        records = [
+            Command('word this', [BasicAction('insert', ['this'])]),
+            Command('word this', [BasicAction('insert', ['this']), BasicAction('user.action', [1, True, None, 'text'])]),
+        ]
+        with tempfile.TemporaryDirectory() as directory:
+            record_path = os.path.join(directory, 'record.txt')
+            output_command_history_to_file(records, record_path)
+            history = read_file_record(record_path, CommandHistory())
+        self.assertIsInstance(history, CommandHistory)
+        assert_records_match(self, history, records)
+
+class RecordReadingTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.record_path = os.path.join(self.directory.name, 'record.txt')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _write_record(self, text: str):
+        with open(self.record_path, 'w', encoding='utf-8') as file:
+            file.write(text)
+
+    def test_assigns_times_to_the_following_command(self):
+        self._write_record(
+            'T5\nCommand: word this\n{"name": "insert", "arguments": ["this"]}\n'
+            'Command: enter\n{"name": "key", "arguments": ["enter"]}\n{"name": "insert", "arguments": ["\\u00e9"]}\n'
+            'START\nT7\nCommand: nothing\nCommand: last\n{"name": "user.action", "arguments": [1, true, null]}'
+        )
+        expected_records = [
+            Command('word this', [BasicAction('insert', ['this'])], 5),
+            Command('enter', [BasicAction('key', ['enter']), BasicAction('insert', ['\u00e9'])]),
+            RecordingStart(),
+            Command('last', [BasicAction('user.action', [1, True, None])]),
+        ]
+        assert_records_match(self, list(iter_file_record(self.record_path)), expected_records)
+        assert_records_match(self, read_file_record(self.record_path), expected_records)
+
+    def test_reads_lines_split_across_blocks(self):
+        command_names = ['word caf\u00e9 ' + str(number) for number in range(100)]
+        self._write_record(''.join(f'Command: {name}\r\n{{"name": "insert", "arguments": ["x"]}}\r\n' for name in command_names))
+        original_block_size = action_records.RECORD_READING_BLOCK_SIZE
+        action_records.RECORD_READING_BLOCK_SIZE = 7
+        try:
+            records = list(iter_file_record(self.record_path))
+        finally:
+            action_records.RECORD_READING_BLOCK_SIZE = original_block_size
+        self.assertEqual([record.get_name() for record in records], command_names)
+
+    def test_does_not_share_arguments_between_actions(self):
+        self._write_record('Command: a\n{"name": "key", "arguments": ["a"]}\nCommand: b\n{"name": "key", "arguments": ["a"]}\n')
+        first_command, second_command = read_file_record(self.record_path)
+        first_command.get_actions()[0].get_arguments().append('b')
+        self.assertEqual(second_command.get_actions()[0].get_arguments(), ['a'])
+
+    def test_parallel_reading_carries_times_across_ranges(self):
+        self._write_record(''.join(
+            f'Command: word {number}\n{{"name": "insert", "arguments": ["{number}"]}}\n' + ('T' + str(number) + '\n' if number % 3 else '') + ('START\n' if number % 7 == 0 else '')
+            for number in range(50)
+        ))
+        ranges = split_record_file_into_ranges(self.record_path, 10)
+        self.assertGreater(len(ranges), 1)
+        self.assertTrue(any(seconds_since_last_action is not None for _, _, seconds_since_last_action in ranges))
+        assert_records_match(self, read_file_record_in_parallel(self.record_path, 2), read_file_record(self.record_path))
+
+    def test_parallel_reading_only_splits_at_lines_that_start_commands(self):
+        self._write_record('{"name": "insert", "arguments": ["x"]}\nCommand: \nT-3\nT1\n')
+        records = read_file_record(self.record_path)
+        self.assertEqual(records[0].get_seconds_since_action(), -3)
+        self.assertEqual(len(split_record_file_into_ranges(self.record_path, 2)), 1)
+        assert_records_match(self, read_file_record_in_parallel(self.record_path, 2), records)
+
+    def test_reads_empty_records(self):
+        self._write_record('')
+        self.assertEqual(read_file_record(self.record_path), [])
+
+class RecordIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.record_path = os.path.join(self.directory.name, 'record.txt')
+        with open(self.record_path, 'w', encoding='utf-8') as file:
+            file.write(
+                'T1\nCommand: caf\u00e9 one\n{"name": "insert", "arguments": ["one"]}\nT2\n'
+                'Command: two\n{"name": "insert", "arguments": ["two"]}\nSTART\n'
+                '{"name": "insert", "arguments": ["nameless"]}\nCommand: empty\nT3\n'
+                'Command: three\n{"name": "insert", "arguments": ["three"]}\nSTART\n'
+            )
+        self.records = read_file_record(self.record_path)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_reads_command_ranges_like_list_slices(self):
+        index = write_record_index(self.record_path)
+        self.assertEqual(index.get_number_of_commands(), 4)
+        self.assertEqual(index.get_number_of_recording_starts(), 2)
+        command_positions = [position for position, record in enumerate(self.records) if record.is_command_record()] + [len(self.records)]
+        for starting_command_number in range(5):
+            for ending_command_number in range(starting_command_number, 5):
+                expected_records = self.records[command_positions[starting_command_number]:command_positions[ending_command_number]] if starting_command_number < ending_command_number else []
+                assert_records_match(self, read_file_record_range(self.record_path, starting_command_number, ending_command_number), expected_records)
+
+    def test_reads_recording_segments(self):
+        self.assertEqual([len(read_recording_segment(self.record_path, segment_number)) for segment_number in range(3)], [2, 2, 0])
+        assert_records_match(self, read_recording_segment(self.record_path, 1), self.records[3:5])
+        with self.assertRaises(IndexError):
+            read_recording_segment(self.record_path, 3)
+
+    def test_ignores_index_for_a_different_record(self):
+        write_record_index(self.record_path)
+        self.assertIsNotNone(RecordIndex.load(compute_record_index_path(self.record_path), os.path.getsize(self.record_path)))
+        with open(self.record_path, 'a') as file:
+            file.write('Command: four\n{"name": "insert", "arguments": ["four"]}\n')
+        self.assertIsNone(RecordIndex.load(compute_record_index_path(self.record_path), os.path.getsize(self.record_path)))
+        self.assertEqual(get_record_index(self.record_path).get_number_of_commands(), 5)
+
+class BinaryRecordTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.record_path = os.path.join(self.directory.name, 'record.bin')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _write_records(self, records):
+        encoder = BinaryRecordEncoder()
+        with open(self.record_path, 'wb') as file:
+            file.write(encoder.create_header())
+            for record in records:
+                file.write(encoder.encode_record(record))
+
+    def test_reads_back_encoded_records(self):
+        records = create_test_records()[:-1] + [
+            Command('caf\u00e9', [BasicAction('key', [-700, 1.5, False, 1 << 70, {'name': 'letter', 'instance': 1}, ['list']])], -3),
+            Command('word this', [BasicAction('insert', ['this'])], 1 << 40),
+        ]
+        self._write_records(records)
+        actual_records = read_binary_file_record(self.record_path)
+        assert_records_match(self, actual_records, records)
+        self.assertIsInstance(actual_records[3].get_actions()[1].get_arguments()[3], TalonCapture)
+        assert_records_match(self, read_binary_file_record(self.record_path, CommandHistory()), records)
+
+    def test_does_not_share_arguments_between_actions(self):
+        self._write_records([Command('word a', [BasicAction('insert', ['a'])]), Command('word a', [BasicAction('insert', ['a'])])])
+        first_command, second_command = iter_binary_file_record(self.record_path)
+        first_command.get_actions()[0].get_arguments().append('b')
+        self.assertEqual(second_command.get_actions()[0].get_arguments(), ['a'])
+
+    def test_rejects_other_files(self):
+        with open(self.record_path, 'w') as file:
+            file.write('Command: word this\n')
+        with self.assertRaises(ValueError):
+            read_binary_file_record(self.record_path)
+
+class CompressedRecordTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.records = [record for record in create_test_records() if not record.is_command_record() or record.get_actions()]
+        self.records[3] = Command('word caf\u00e9', [BasicAction('user.action', [1, True, None])], 2)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_reads_back_records_written_with_every_compression(self):
+        for extension in COMPRESSION_EXTENSIONS:
+            with self.subTest(extension=extension):
+                text_record_path = os.path.join(self.directory.name, 'record.txt' + extension)
+                binary_record_path = os.path.join(self.directory.name, 'record.bin' + extension)
+                output_records_to_text_file(self.records, text_record_path)
+                output_commands_to_binary_file(self.records, binary_record_path)
+                with open_record_file(text_record_path, 'r') as file:
+                    self.assertTrue(file.read().startswith('T3\nCommand: word this\n'))
+                assert_records_match(self, read_file_record(text_record_path), self.records)
+                assert_records_match(self, read_file_record_in_parallel(text_record_path, 2), self.records)
+                assert_records_match(self, read_binary_file_record(binary_record_path), self.records)
+                assert_records_match(self, read_binary_file_record(binary_record_path, CommandHistory()), self.records)
+
+    def test_streams_records_across_blocks(self):
+        text_record_path = os.path.join(self.directory.name, 'record.txt')
+        binary_record_path = os.path.join(self.directory.name, 'record')
+        records = self.records*20
+        output_records_to_text_file(records, text_record_path, compression='bz2')
+        output_commands_to_binary_file(records, binary_record_path, compression='gzip')
+        original_block_size = action_records.RECORD_READING_BLOCK_SIZE
+        action_records.RECORD_READING_BLOCK_SIZE = 7
+        try:
+            assert_records_match(self, list(iter_file_record(text_record_path, 'bz2')), records)
+            assert_records_match(self, list(iter_binary_file_record(binary_record_path, 'gzip')), records)
+        finally:
+            action_records.RECORD_READING_BLOCK_SIZE = original_block_size
+
+    def test_opens_every_record_as_utf8_with_unchanged_new_lines(self):
+        for extension in [''] + list(COMPRESSION_EXTENSIONS):
+            with self.subTest(extension=extension):
+                record_path = os.path.join(self.directory.name, 'record.txt' + extension)
+                with open_record_file(record_path, 'w') as file:
+                    self.assertEqual(file.encoding, 'utf-8')
+                    file.write('Command: word caf\u00e9\n')
+                with open_record_file(record_path, 'rb') as file:
+                    self.assertEqual(file.read(), 'Command: word caf\u00e9\n'.encode('utf-8'))
+
+    def test_does_not_index_compressed_records(self):
+        record_path = os.path.join(self.directory.name, 'record.txt.gz')
+        with self.assertRaises(ValueError):
+            output_commands_to_file(self.records, record_path, should_write_index=True)
+
+    def test_importing_does_not_import_compression_or_process_modules(self):
+        directory = os.path.dirname(os.path.abspath(__file__))
+        script = "import sys\nimport action_records\nprint(sorted({'gzip', 'bz2', 'lzma', 'concurrent.futures'} & set(sys.modules)))"
+        output = subprocess.run([sys.executable, '-c', script], cwd=directory, capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.strip(), '[]')
+
+if __name__ == '__main__':
+    unittest.main()
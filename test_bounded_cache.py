@@ -0,0 +1,22 @@
+from bounded_cache import BoundedCache
+import unittest
+
+class BoundedCacheTestCase(unittest.TestCase):
+    def test_remembers_values(self):
+        cache = BoundedCache(4)
+        cache.remember('word', True)
+        self.assertTrue(cache.get('word'))
+        self.assertIsNone(cache.get('other'))
+        self.assertIn('word', cache)
+
+    def test_forgets_everything_when_full(self):
+        cache = BoundedCache(2)
+        cache.remember('first', 1)
+        cache.remember('second', 2)
+        cache.remember('third', 3)
+        self.assertEqual(len(cache), 1)
+        self.assertIsNone(cache.get('first'))
+        self.assertEqual(cache.get('third'), 3)
+
+if __name__ == '__main__':
+    unittest.main()
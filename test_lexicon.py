@@ -0,0 +1,101 @@
+from lexicon import create_lexicon_from_words, compile_lexicon_artifact, load_lexicon, load_lexicon_artifact, \
+    is_lexicon_artifact_current
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+TEST_WORDS = ["test", "testing", "this", "is", "a", "chicken"]
+
+def assert_lexicon_knows_test_words(assertion_class, lexicon):
+    for word in TEST_WORDS:
+        assertion_class.assertTrue(lexicon.is_word(word))
+    for text in ["tes", "chickens", "zebra", ""]:
+        assertion_class.assertFalse(lexicon.is_word(text))
+    for text in ["tes", "testi", "chicken", "", "thi"]:
+        assertion_class.assertTrue(lexicon.could_be_start_of_word(text))
+    for text in ["testz", "zebra", "chickens"]:
+        assertion_class.assertFalse(lexicon.could_be_start_of_word(text))
+    assertion_class.assertEqual(lexicon.get_maximum_word_length(), len("chicken"))
+    assertion_class.assertEqual(sorted(TEST_WORDS), list(lexicon))
+
+class LexiconTestCase(unittest.TestCase):
+    def test_answers_word_and_prefix_questions(self):
+        lexicon = create_lexicon_from_words(TEST_WORDS)
+        assert_lexicon_knows_test_words(self, lexicon)
+
+    def test_handles_words_smashed_together(self):
+        lexicon = create_lexicon_from_words(TEST_WORDS)
+        for text in ["testthis", "thisisatest", "thisisatesti", "chick", "thisch"]:
+            self.assertTrue(lexicon.could_be_start_of_words_smashed_together(text))
+        for text in ["thisz", "testthisq", "zthis"]:
+            self.assertFalse(lexicon.could_be_start_of_words_smashed_together(text))
+
+class LexiconArtifactTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.words_path = os.path.join(self.directory.name, 'words.txt')
+        self.artifact_path = os.path.join(self.directory.name, 'words.lexicon')
+        self._write_words(TEST_WORDS)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _write_words(self, words):
+        with open(self.words_path, 'w') as words_file:
+            words_file.write('\n'.join(words))
+
+    def test_loads_compiled_artifact(self):
+        compile_lexicon_artifact(self.words_path, self.artifact_path)
+        self.assertTrue(is_lexicon_artifact_current(self.artifact_path, self.words_path))
+        lexicon = load_lexicon_artifact(self.artifact_path)
+        assert_lexicon_knows_test_words(self, lexicon)
+
+    def test_rebuilds_artifact_when_words_change(self):
+        first_lexicon = load_lexicon(self.words_path, self.artifact_path)
+        self.assertFalse(first_lexicon.is_word("zebra"))
+        self._write_words(TEST_WORDS + ["zebra"])
+        later_time = time.time() + 10
+        os.utime(self.words_path, (later_time, later_time))
+        self.assertFalse(is_lexicon_artifact_current(self.artifact_path, self.words_path))
+        second_lexicon = load_lexicon(self.words_path, self.artifact_path)
+        self.assertTrue(second_lexicon.is_word("zebra"))
+        self.assertNotEqual(first_lexicon.get_version(), second_lexicon.get_version())
+
+    def test_rebuilds_artifact_when_words_change_without_changing_size_or_modification_time(self):
+        first_lexicon = load_lexicon(self.words_path, self.artifact_path)
+        words_file_status = os.stat(self.words_path)
+        self._write_words(["tent" if word == "test" else word for word in TEST_WORDS])
+        os.utime(self.words_path, ns=(words_file_status.st_atime_ns, words_file_status.st_mtime_ns))
+        self.assertFalse(is_lexicon_artifact_current(self.artifact_path, self.words_path))
+        second_lexicon = load_lexicon(self.words_path, self.artifact_path)
+        self.assertTrue(second_lexicon.is_word("tent"))
+        self.assertFalse(second_lexicon.is_word("test"))
+        self.assertNotEqual(first_lexicon.get_version(), second_lexicon.get_version())
+
+    def test_keeps_artifact_when_only_the_modification_time_changes(self):
+        compile_lexicon_artifact(self.words_path, self.artifact_path)
+        later_time = time.time() + 10
+        os.utime(self.words_path, (later_time, later_time))
+        self.assertTrue(is_lexicon_artifact_current(self.artifact_path, self.words_path))
+
+def has_lexicon_been_loaded_after_running(code: str) -> bool:
+    directory = os.path.dirname(os.path.abspath(__file__))
+    script = code + "\nimport lexicon\nprint(lexicon.has_lexicon_been_loaded())"
+    output = subprocess.run([sys.executable, '-c', script], cwd=directory, capture_output=True, text=True, check=True).stdout
+    return output.strip().endswith('True')
+
+class LazyLexiconLoadingTestCase(unittest.TestCase):
+    def test_importing_does_not_load_lexicon(self):
+        self.assertFalse(has_lexicon_been_loaded_after_running("import text_parsing\ntext_parsing.PatternManager()"))
+
+    def test_symbol_commands_do_not_load_lexicon(self):
+        self.assertFalse(has_lexicon_been_loaded_after_running("import patterns\npatterns.create_symbol_command('!')"))
+
+    def test_word_matching_loads_lexicon(self):
+        self.assertTrue(has_lexicon_been_loaded_after_running("import patterns\npatterns.create_word_pattern_matcher().does_belong_to_pattern('tes', 't')"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,285 @@
+from main import regenerate_record_incrementally, output_commands_for_text_file, convert_text_record_to_binary, convert_binary_record_to_text, \
+    BINARY_RECORD_FORMAT, output_commands_to_file, generate_commands_from_text_file, create_command_history_list_from_text_file, record_command_to_file, \
+    compute_batch_output_paths, process_batch, INPUT_CHUNK_SIZE, convert_record
+import main
+from action_records import RecordIndex, create_record_index, compute_record_index_path, read_file_record_range, read_file_record, read_binary_file_record, \
+    open_record_file, BinaryRecordEncoder, Command, BasicAction, RecordingStart, TalonCapture
+from text_parsing import ParsingEngine
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+class IncrementalRegenerationTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.input_path = os.path.join(self.directory.name, 'input.txt')
+        self.output_path = os.path.join(self.directory.name, 'output.txt')
+        self.expected_output_path = os.path.join(self.directory.name, 'expected.txt')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _write_input(self, text: str):
+        with open(self.input_path, 'w', encoding='utf-8', newline='\n') as file:
+            file.write(text)
+
+    def _read_file(self, path: str) -> str:
+        with open(path, 'r', encoding='utf-8', newline='\n') as file:
+            return file.read()
+
+    def _assert_output_matches_full_generation(self):
+        output_commands_for_text_file(self.input_path, self.expected_output_path, should_ignore_indentation=False)
+        self.assertEqual(self._read_file(self.output_path), self._read_file(self.expected_output_path))
+
+    def test_only_parses_changed_lines(self):
+        self._write_input("this is a test\nsome_value = 3\n\tTestCase\nthe end")
+        _, number_of_parsed_lines = regenerate_record_incrementally(self.input_path, self.output_path, should_ignore_indentation=False)
+        self.assertEqual(number_of_parsed_lines, 4)
+        self._assert_output_matches_full_generation()
+        self._write_input("this is a test\nsome_other_value = 3\n\tTestCase\nnew line\nthe end")
+        number_of_commands, number_of_parsed_lines = regenerate_record_incrementally(self.input_path, self.output_path, should_ignore_indentation=False)
+        self.assertEqual(number_of_parsed_lines, 2)
+        self._assert_output_matches_full_generation()
+        self.assertEqual(number_of_commands, self._read_file(self.output_path).count("Command: "))
+
+    def test_regenerates_compressed_records(self):
+        self.output_path += '.gz'
+        self._write_input("this is a test\nsome_value = 3\n")
+        regenerate_record_incrementally(self.input_path, self.output_path, should_ignore_indentation=False)
+        self._write_input("this is a caf\u00e9 test\nsome_value = 3\n")
+        _, number_of_parsed_lines = regenerate_record_incrementally(self.input_path, self.output_path, should_ignore_indentation=False)
+        self.assertEqual(number_of_parsed_lines, 1)
+        output_commands_for_text_file(self.input_path, self.expected_output_path, should_ignore_indentation=False)
+        with open_record_file(self.output_path, 'r') as file:
+            self.assertEqual(file.read(), self._read_file(self.expected_output_path))
+
+    def test_parses_everything_when_options_change(self):
+        self._write_input("this is a test\n    indented\n")
+        regenerate_record_incrementally(self.input_path, self.output_path, should_ignore_indentation=False)
+        _, number_of_parsed_lines = regenerate_record_incrementally(self.input_path, self.output_path, should_ignore_indentation=True)
+        self.assertEqual(number_of_parsed_lines, 2)
+
+    def test_parses_everything_when_the_compression_changes(self):
+        self._write_input("this is a test\nsome_value = 3\n")
+        regenerate_record_incrementally(self.input_path, self.output_path, should_ignore_indentation=False)
+        _, number_of_parsed_lines = regenerate_record_incrementally(self.input_path, self.output_path, should_ignore_indentation=False, compression='gzip')
+        self.assertEqual(number_of_parsed_lines, 2)
+        output_commands_for_text_file(self.input_path, self.expected_output_path, should_ignore_indentation=False)
+        with open_record_file(self.output_path, 'r', 'gzip') as file:
+            self.assertEqual(file.read(), self._read_file(self.expected_output_path))
+
+class StreamingOutputTestCase(unittest.TestCase):
+    def test_matches_writing_the_command_list(self):
+        with tempfile.TemporaryDirectory() as directory:
+            input_path = os.path.join(directory, 'input.txt')
+            output_path = os.path.join(directory, 'output.txt')
+            expected_output_path = os.path.join(directory, 'expected.txt')
+            with open(input_path, 'w') as file:
+                file.write("this is a test\nsome_value = 3\n\tTestCase\n" * 20)
+            command_history = create_command_history_list_from_text_file(input_path, should_ignore_indentation=False)
+            with open(expected_output_path, 'w') as file:
+                for command in command_history:
+                    record_command_to_file(command, file)
+            original_block_size = main.OUTPUT_BLOCK_SIZE
+            main.OUTPUT_BLOCK_SIZE = 100
+            try:
+                number_of_commands = output_commands_to_file(generate_commands_from_text_file(input_path, should_ignore_indentation=False), output_path)
+            finally:
+                main.OUTPUT_BLOCK_SIZE = original_block_size
+            self.assertEqual(number_of_commands, len(command_history))
+            with open(output_path, 'r') as output_file, open(expected_output_path, 'r') as expected_output_file:
+                self.assertEqual(output_file.read(), expected_output_file.read())
+
+class BatchTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.input_directory = os.path.join(self.directory.name, 'input')
+        self.output_directory = os.path.join(self.directory.name, 'output')
+        self._write_input('first.py', "this is a test\n")
+        self._write_input(os.path.join('nested', 'second.py'), "some_value = 3\n")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _write_input(self, name: str, text: str):
+        self._write_input_bytes(name, text.encode('utf-8'))
+
+    def _write_input_bytes(self, name: str, data: bytes):
+        path = os.path.join(self.input_directory, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(data)
+
+    def _process_batch(self, output_path: str, should_merge_records: bool = False) -> str:
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            process_batch(self.input_directory, output_path, should_merge_records=should_merge_records, number_of_processes=1,
+                          spaces_per_tab=0, should_ignore_indentation=False, engine=ParsingEngine.GREEDY)
+        return output.getvalue()
+
+    def _create_record_text(self, name: str) -> str:
+        output_path = os.path.join(self.directory.name, 'expected.txt')
+        output_commands_for_text_file(os.path.join(self.input_directory, name), output_path, should_ignore_indentation=False)
+        with open(output_path, 'r', encoding='utf-8', newline='\n') as file:
+            return file.read()
+
+    def _read_file(self, path: str) -> str:
+        with open(path, 'r', encoding='utf-8', newline='\n') as file:
+            return file.read()
+
+    def test_mirrors_input_directories_in_the_output_directory(self):
+        input_paths = [os.path.join(self.input_directory, 'first.py'), os.path.join(self.input_directory, 'nested', 'second.py')]
+        self.assertEqual(compute_batch_output_paths(input_paths, 'output'), [os.path.join('output', 'first.py.txt'), os.path.join('output', 'nested', 'second.py.txt')])
+        self.assertEqual(compute_batch_output_paths(input_paths, 'output', 'gzip')[1], os.path.join('output', 'nested', 'second.py.txt.gz'))
+
+    def test_writes_a_record_for_every_input_file(self):
+        self._process_batch(self.output_directory)
+        self.assertEqual(self._read_file(os.path.join(self.output_directory, 'first.py.txt')), self._create_record_text('first.py'))
+        self.assertEqual(self._read_file(os.path.join(self.output_directory, 'nested', 'second.py.txt')), self._create_record_text(os.path.join('nested', 'second.py')))
+
+    def test_merges_records_with_recording_starts_between_files(self):
+        output_path = os.path.join(self.directory.name, 'merged.txt')
+        self._process_batch(output_path, should_merge_records=True)
+        self.assertEqual(self._read_file(output_path), self._create_record_text('first.py') + 'START\n' + self._create_record_text(os.path.join('nested', 'second.py')))
+        records = read_file_record(output_path)
+        self.assertEqual(sum(1 for record in records if not record.is_command_record()), 1)
+
+    def test_skips_files_that_are_not_text(self):
+        self._write_input_bytes('image.png', b'\x89PNG\xff\xfe\x00')
+        output = self._process_batch(self.output_directory)
+        self.assertIn("Skipped " + os.path.join(self.input_directory, 'image.png'), output)
+        self.assertFalse(os.path.exists(os.path.join(self.output_directory, 'image.png.txt')))
+        self.assertTrue(os.path.exists(os.path.join(self.output_directory, 'first.py.txt')))
+
+    def test_removes_the_partial_record_of_a_file_that_fails_part_way(self):
+        #The invalid bytes are only reached after the commands for the first chunk of the file are created
+        self._write_input_bytes('failing.py', b'\n' * INPUT_CHUNK_SIZE + b'\xff\xfe')
+        output_path = os.path.join(self.directory.name, 'merged.txt')
+        self._process_batch(output_path, should_merge_records=True)
+        self.assertEqual(self._read_file(output_path), self._create_record_text('first.py') + 'START\n' + self._create_record_text(os.path.join('nested', 'second.py')))
+        output = self._process_batch(self.output_directory)
+        self.assertIn("Skipped " + os.path.join(self.input_directory, 'failing.py'), output)
+        self.assertFalse(os.path.exists(os.path.join(self.output_directory, 'failing.py.txt')))
+        self.assertTrue(os.path.exists(os.path.join(self.output_directory, 'nested', 'second.py.txt')))
+
+class RecordIndexOutputTestCase(unittest.TestCase):
+    def test_writes_index_of_command_offsets(self):
+        with tempfile.TemporaryDirectory() as directory:
+            input_path = os.path.join(directory, 'input.txt')
+            output_path = os.path.join(directory, 'output.txt')
+            with open(input_path, 'w') as file:
+                file.write("this is a caf\u00e9 test\nsome_value = 3\n\tTestCase\n")
+            number_of_commands = output_commands_for_text_file(input_path, output_path, should_ignore_indentation=False, should_write_index=True)
+            index = RecordIndex.load(compute_record_index_path(output_path), os.path.getsize(output_path))
+            self.assertIsNotNone(index)
+            self.assertEqual(index.get_number_of_commands(), number_of_commands)
+            self.assertEqual(index.command_offsets, create_record_index(output_path).command_offsets)
+            records = read_file_record(output_path)
+            self.assertEqual([record.get_name() for record in read_file_record_range(output_path, 3, 6, index)], [record.get_name() for record in records[3:6]])
+
+class BinaryRecordConversionTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _create_path(self, name: str) -> str:
+        return os.path.join(self.directory.name, name)
+
+    def _assert_records_match(self, actual_records, expected_records):
+        def describe(record):
+            return str(record) if record.is_command_record() else 'START'
+        self.assertEqual([describe(record) for record in actual_records], [describe(record) for record in expected_records])
+
+    def test_converts_losslessly_in_both_directions(self):
+        text_record_path = self._create_path('record.txt')
+        with open(text_record_path, 'w') as file:
+            file.write(
+                '{"name": "insert", "arguments": ["first"]}\nCommand: word\nSTART\n{"name": "insert", "arguments": ["nameless"]}\n'
+                'T3\nCommand: timed\n{"name": "user.action", "arguments": [{"name": "letter", "instance": 1}, 2.5]}\nT4\nSTART\n'
+                '{"name": "insert", "arguments": ["timed nameless"]}\nCommand: untimed\n{"name": "key", "arguments": ["enter"]}\n'
+            )
+        records = read_file_record(text_record_path)
+        convert_text_record_to_binary(text_record_path, self._create_path('record.bin'))
+        self._assert_records_match(read_binary_file_record(self._create_path('record.bin')), records)
+        convert_binary_record_to_text(self._create_path('record.bin'), self._create_path('converted.txt'))
+        self._assert_records_match(read_file_record(self._create_path('converted.txt')), records)
+
+    def _write_binary_record(self, records) -> str:
+        binary_record_path = self._create_path('record.bin')
+        encoder = BinaryRecordEncoder()
+        with open(binary_record_path, 'wb') as file:
+            file.write(encoder.create_header())
+            for record in records:
+                file.write(encoder.encode_record(record))
+        return binary_record_path
+
+    def test_round_trips_commands_without_names_and_times_through_text(self):
+        records = [
+            Command('', [BasicAction('insert', ['first'])]),
+            Command('timed', [BasicAction('insert', ['a'])], 3),
+            Command('untimed', [BasicAction('insert', ['b'])]),
+            RecordingStart(),
+            Command('', [BasicAction('insert', ['after start'])], 5),
+            Command('untimed after carried time', [BasicAction('insert', ['c'])]),
+            RecordingStart(),
+            RecordingStart(),
+            Command('', [BasicAction('insert', ['untimed after start'])]),
+            Command('timed', [BasicAction('insert', ['d'])], -2),
+            RecordingStart(),
+        ]
+        convert_binary_record_to_text(self._write_binary_record(records), self._create_path('converted.txt'))
+        self._assert_records_match(read_file_record(self._create_path('converted.txt')), records)
+        with open(self._create_path('converted.txt'), 'r') as file:
+            self.assertNotIn('reset time', file.read())
+
+    def test_rejects_records_that_text_cannot_represent(self):
+        for records in [
+            [Command('a', [BasicAction('insert', ['x'])]), Command('', [BasicAction('insert', ['y'])])],
+            [Command('', [BasicAction('insert', ['x'])], 4)],
+            [Command('trailing space ', [BasicAction('insert', ['x'])])],
+            [Command('line\nbreak', [BasicAction('insert', ['x'])])],
+            [Command('capture', [BasicAction('user.action', [TalonCapture('user.text', 1, '_post')])])],
+            [Command('capture', [BasicAction('user.action', [TalonCapture('user.text', 1)])])],
+        ]:
+            with self.subTest(records=records):
+                with self.assertRaises(ValueError):
+                    convert_binary_record_to_text(self._write_binary_record(records), self._create_path('converted.txt'))
+                self.assertFalse(os.path.exists(self._create_path('converted.txt')))
+
+    def test_keeps_captures_or_refuses_to_convert_them(self):
+        records = [Command('capture', [BasicAction('user.action', [TalonCapture('user.text', 1, '_post'), ['list', 2]])])]
+        binary_record_path = self._write_binary_record(records)
+        self._assert_records_match(read_binary_file_record(binary_record_path), records)
+        self.assertEqual(read_binary_file_record(binary_record_path)[0].get_actions()[0].get_arguments()[0], TalonCapture('user.text', 1, '_post'))
+        with self.assertRaises(ValueError):
+            convert_record(binary_record_path, self._create_path('converted.txt'))
+        self.assertFalse(os.path.exists(self._create_path('converted.txt')))
+
+    def test_writes_binary_records_for_text_files(self):
+        input_path = self._create_path('input.txt')
+        with open(input_path, 'w') as file:
+            file.write("this is a caf\u00e9 test\nsome_value = 3\n")
+        output_commands_for_text_file(input_path, self._create_path('output.txt'), should_ignore_indentation=False)
+        number_of_commands = output_commands_for_text_file(input_path, self._create_path('output.bin'), should_ignore_indentation=False, record_format=BINARY_RECORD_FORMAT)
+        binary_records = read_binary_file_record(self._create_path('output.bin'))
+        self.assertEqual(len(binary_records), number_of_commands)
+        self._assert_records_match(binary_records, read_file_record(self._create_path('output.txt')))
+        self.assertLess(os.path.getsize(self._create_path('output.bin')), os.path.getsize(self._create_path('output.txt')))
+
+    def test_converts_compressed_records(self):
+        input_path = self._create_path('input.txt')
+        with open(input_path, 'w') as file:
+            file.write("this is a caf\u00e9 test\nsome_value = 3\n")
+        output_commands_for_text_file(input_path, self._create_path('output.txt.xz'), should_ignore_indentation=False)
+        records = read_file_record(self._create_path('output.txt.xz'))
+        convert_text_record_to_binary(self._create_path('output.txt.xz'), self._create_path('output.bin.gz'))
+        self._assert_records_match(read_binary_file_record(self._create_path('output.bin.gz')), records)
+        convert_binary_record_to_text(self._create_path('output.bin.gz'), self._create_path('converted.txt.bz2'))
+        self._assert_records_match(read_file_record(self._create_path('converted.txt.bz2')), records)
+
+if __name__ == '__main__':
+    unittest.main()
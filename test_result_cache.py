@@ -0,0 +1,80 @@
+from result_cache import ResultCache, GENERATOR_SOURCE_FILE_PATHS, CURRENT_DIRECTORY
+import main
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+class ResultCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = ResultCache(os.path.join(self.directory.name, 'cache'))
+        self.input_path = self._create_file('input.txt', "this is a test")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _create_file(self, name: str, text: str) -> str:
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w', encoding='utf-8', newline='\n') as file:
+            file.write(text)
+        return path
+
+    def _read_file(self, path: str) -> str:
+        with open(path, 'r', encoding='utf-8', newline='\n') as file:
+            return file.read()
+
+    def test_generator_version_covers_every_module_main_imports(self):
+        repository_directory = os.path.abspath(CURRENT_DIRECTORY)
+        imported_paths = set()
+        for module in list(sys.modules.values()):
+            path = getattr(module, '__file__', None)
+            if path and os.path.dirname(os.path.abspath(path)) == repository_directory and not os.path.basename(path).startswith('test_'):
+                imported_paths.add(os.path.abspath(path))
+        self.assertIn(os.path.abspath(main.__file__), imported_paths)
+        self.assertLessEqual(imported_paths, {os.path.abspath(path) for path in GENERATOR_SOURCE_FILE_PATHS})
+
+    def test_key_depends_on_input_and_options(self):
+        key = self.cache.compute_key(self.input_path, spaces_per_tab=0)
+        self.assertEqual(key, self.cache.compute_key(self.input_path, spaces_per_tab=0))
+        self.assertNotEqual(key, self.cache.compute_key(self.input_path, spaces_per_tab=4))
+        other_input_path = self._create_file('other.txt', "this is another test")
+        self.assertNotEqual(key, self.cache.compute_key(other_input_path, spaces_per_tab=0))
+
+    def test_returns_stored_records(self):
+        key = self.cache.compute_key(self.input_path)
+        self.assertIsNone(self.cache.read_entry(key))
+        self.cache.store_text(key, "Command: test\n")
+        self.assertEqual(self.cache.read_entry(key), "Command: test\n")
+        output_path = os.path.join(self.directory.name, 'output.txt')
+        self.assertTrue(self.cache.copy_entry(key, output_path))
+        self.assertEqual(self._read_file(output_path), "Command: test\n")
+
+    def test_stores_records_as_utf8_with_newline_line_endings(self):
+        record = "Insert: café\nPress: enter\n"
+        self.cache.store_text("aa", record)
+        output_path = os.path.join(self.directory.name, 'output.txt')
+        self.assertTrue(self.cache.copy_entry("aa", output_path))
+        with open(output_path, 'rb') as file:
+            self.assertEqual(file.read(), record.encode('utf-8'))
+        self.assertEqual(self.cache.read_entry("aa"), record)
+
+    def test_evicts_least_recently_used_records(self):
+        self.cache.maximum_size = len("record") * 2
+        for key in ["aa", "bb", "cc"]:
+            self.cache.store_text(key, "record")
+            time.sleep(0.01)
+        self.cache.read_entry("aa")
+        self.cache.evict()
+        self.assertIsNotNone(self.cache.read_entry("aa"))
+        self.assertIsNone(self.cache.read_entry("bb"))
+        self.assertIsNotNone(self.cache.read_entry("cc"))
+
+    def test_clear_removes_every_record(self):
+        self.cache.store_text("aa", "record")
+        self.cache.clear()
+        self.assertIsNone(self.cache.read_entry("aa"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,9 @@
 from patterns import SYMBOLS_TO_SPOKEN_FORM, create_new_line_pattern_matcher, create_symbol_pattern_matcher, create_command_from_pattern_matcher, \
     create_word_pattern_matcher, create_formatted_words_pattern_matcher, create_formatted_word_pattern_matcher, create_prose_pattern_matcher, \
-    is_valid_prose_token, create_tab_pattern_matcher
-from text_parsing import create_command_history_list_from_text
+    is_valid_prose_token, create_tab_pattern_matcher, separate_words_smashed_together, get_command_memo_statistics, \
+    SmashedWordsLattice
+from text_parsing import create_command_history_list_from_text, CurrentText, ParsingEngine, TextParser, split_text_into_character_runs, CharacterClass, \
+    split_text_into_independent_chunks, create_command_history_list_from_text_in_parallel, generate_commands_from_text_chunks, SegmentingTextParser
 from action_records import Command, BasicAction
 import unittest
 
@@ -101,6 +103,43 @@ def test_creates_correct_command_for_one_character_pattern_matcher(
     assert_command_has_correct_name(assertion_class, command, command_name)
     assert_key_command_matches_text(assertion_class, command, text)
 
+class SeparateWordsSmashedTogetherTest(unittest.TestCase):
+    def test_prefers_longest_first_word(self):
+        self.assertEqual(separate_words_smashed_together("testcase", is_a_word), ["test", "case"])
+
+    def test_keeps_casing_rules(self):
+        self.assertEqual(separate_words_smashed_together("TestCase", is_a_word), ["Test", "Case"])
+        self.assertIsNone(separate_words_smashed_together("tEstcase", is_a_word))
+
+    def test_checks_each_prefix_of_each_suffix_at_most_once(self):
+        checked_texts = []
+        def is_word(text: str) -> bool:
+            checked_texts.append(text)
+            return is_a_word(text)
+        text = "ana" * 15 + "q"
+        self.assertIsNone(separate_words_smashed_together(text, is_word))
+        self.assertLessEqual(len(checked_texts), len(text) * (len(text) + 1) // 2)
+
+    def test_lattice_matches_separation_as_characters_are_added(self):
+        is_start_of_word = create_word_pattern_matcher().is_start_of_word
+        lattice = SmashedWordsLattice()
+        text = "GetIDThisIsatestcaseTEST"
+        for index, character in enumerate(text):
+            lattice = lattice.create_extension(character, is_a_word, is_start_of_word)
+            self.assertEqual(lattice.separate_words(), separate_words_smashed_together(text[:index + 1], is_a_word))
+
+    def test_lattice_only_looks_up_starts_that_can_still_become_words(self):
+        checked_texts = []
+        def is_start_of_word(text: str) -> bool:
+            checked_texts.append(text)
+            return text.lower() in ["t", "te", "tes", "test"]
+        lattice = SmashedWordsLattice()
+        for character in "test" * 20:
+            number_of_checked_texts = len(checked_texts)
+            lattice = lattice.create_extension(character, lambda text: text.lower() == "test", is_start_of_word)
+            self.assertLessEqual(len(checked_texts) - number_of_checked_texts, 2)
+        self.assertEqual(lattice.separate_words(), ["test"]*20)
+
 class NewLinePatternMatcherTestCase(unittest.TestCase):
     def _create_non_matching_text_list(self):
         return ['a', 'b', 'c', 'd', 'e', 'f', 'g', 'h', 'i', ' ']
@@ -161,6 +200,16 @@ class WordPatternMatcherTestCase(unittest.TestCase):
         invalid_characters = ["1", " ", "\n"]
         for invalid_character in invalid_characters:
             self.assertFalse(pattern_matcher.could_potentially_belong_to_pattern(valid_word, invalid_character))
+
+    def test_rejects_text_that_does_not_start_any_word(self):
+        pattern_matcher = create_word_pattern_matcher()
+        for text in ["zzq", "testq", "qx"]:
+            self.assertFalse(pattern_matcher.could_potentially_belong_to_pattern(text[:-1], text[-1]))
+
+    def test_accepts_text_that_starts_a_word(self):
+        pattern_matcher = create_word_pattern_matcher()
+        for text in ["chick", "tes", "Chick"]:
+            self.assertTrue(pattern_matcher.could_potentially_belong_to_pattern(text[:-1], text[-1]))
         
     def test_creates_correct_command(self):
         text = "test"
@@ -216,17 +265,29 @@ class FormattedWordsPatternMatcherTestCase(unittest.TestCase):
 
     def test_rejects_stuff_that_could_not_potentially_match(self):
         pattern_matcher = create_formatted_words_pattern_matcher()
-        invalid_texts = ["1", " ", "?", "zrrr_chicken", "chicken_9", "word?chicken", "test?", "_", "-"]
+        invalid_texts = ["1", " ", "?", "zrrr_chicken", "chicken_9", "word?chicken", "test?", "_", "-", "testThq", "test_thq"]
         for invalid_text in invalid_texts:
             self.assertFalse(pattern_matcher.could_potentially_belong_to_pattern(invalid_text[:-1], invalid_text[-1]))
 
     def test_accepts_stuff_that_could_potentially_match(self):
         pattern_matcher = create_formatted_words_pattern_matcher()
-        valid_texts = ["abbb",
+        valid_texts = ["abbb", "testThi", "chickenwor", "test_thi"
         ]
         for valid_text in valid_texts:
             self.assertTrue(pattern_matcher.could_potentially_belong_to_pattern(valid_text[:-1], valid_text[-1]))
 
+    def test_growing_candidate_gets_same_answers_as_new_candidate(self):
+        growing_pattern_matcher = create_formatted_words_pattern_matcher()
+        texts = ["SOME_LONG_CONSTANT_NAME", "chicken_testing-this", "another__test__here_", "thisIsATeam", "a.test.with.dots", "zrrr_chicken", "word?chicken"]
+        for text in texts:
+            for length in range(1, len(text) + 1):
+                current_match, next_character = text[:length - 1], text[length - 1]
+                new_pattern_matcher = create_formatted_words_pattern_matcher()
+                self.assertEqual(growing_pattern_matcher.could_potentially_belong_to_pattern(current_match, next_character),
+                                 new_pattern_matcher.could_potentially_belong_to_pattern(current_match, next_character))
+                self.assertEqual(growing_pattern_matcher.does_belong_to_pattern(current_match, next_character),
+                                 new_pattern_matcher.does_belong_to_pattern(current_match, next_character))
+
 class ProsePatternMatcherTestCase(unittest.TestCase):
     def _assert_text_match_outcome_is_expected(self, text, expected_outcome):
         pattern_matcher = create_prose_pattern_matcher()
@@ -250,6 +311,19 @@ class ProsePatternMatcherTestCase(unittest.TestCase):
         pattern_matcher = create_prose_pattern_matcher()
         assert_pattern_matcher_could_not_potentially_match(self, pattern_matcher, text)
 
+    def test_examines_each_completed_token_once(self):
+        pattern_matcher = create_prose_pattern_matcher()
+        examined_words = []
+        does_word_matcher_match = pattern_matcher.word_pattern_matcher.does_belong_to_pattern
+        def record_examined_word(current_match: str, next_character: str) -> bool:
+            examined_words.append(current_match + next_character)
+            return does_word_matcher_match(current_match, next_character)
+        pattern_matcher.word_pattern_matcher.does_belong_to_pattern = record_examined_word
+        text = "this is a test of prose"
+        for i in range(len(text)):
+            self.assertTrue(pattern_matcher.could_potentially_belong_to_pattern(text[:i], text[i]))
+        self.assertEqual(examined_words, ["this", "is", "a", "test", "of"])
+
     def test_rejects_single_token(self):
         tokens = ["chicken", "chicken."]
         self._assert_text_match_outcomes_are_expected(tokens, False)
@@ -390,6 +464,42 @@ class FormattedWordPatternMatcherTest(unittest.TestCase):
             self.assertFalse(pattern_matcher.could_potentially_belong_to_pattern(current_text, next_character))
             self.assertFalse(pattern_matcher.does_belong_to_pattern(current_text, next_character))
 
+class CurrentTextTest(unittest.TestCase):
+    def _create_current_text_after_appending(self, source_text, number_of_characters):
+        current_text = CurrentText(source_text)
+        for _ in range(number_of_characters):
+            current_text.append_next_character()
+        return current_text
+
+    def test_tracks_text_and_next_character(self):
+        current_text = self._create_current_text_after_appending("testing", 4)
+        self.assertEqual(current_text.get_text(), "tes")
+        self.assertEqual(current_text.get_next_character(), "t")
+        self.assertEqual(current_text.compute_total_text(), "test")
+        self.assertEqual(current_text.get_index(), 3)
+
+    def test_removes_last_character(self):
+        current_text = self._create_current_text_after_appending("testing", 4)
+        current_text.remove_last_character()
+        self.assertEqual(current_text.get_text(), "te")
+        self.assertEqual(current_text.get_next_character(), "s")
+
+    def test_resets_to_after_current_index(self):
+        current_text = self._create_current_text_after_appending("testing", 4)
+        current_text.reset_text_information()
+        self.assertEqual(current_text.compute_total_text(), "")
+        self.assertEqual(current_text.get_next_character(), "")
+        current_text.append_next_character()
+        self.assertEqual(current_text.get_text(), "")
+        self.assertEqual(current_text.get_next_character(), "i")
+
+    def test_clone_is_independent(self):
+        current_text = self._create_current_text_after_appending("testing", 4)
+        clone = current_text.clone()
+        current_text.append_next_character()
+        self.assertEqual(clone.compute_total_text(), "test")
+        self.assertEqual(current_text.compute_total_text(), "testi")
+
 class TextParsingTest(unittest.TestCase):
     def test_handles_symbols_only(self):
         expected_command_history = [create_bang_command(), create_dot_command(), create_question_command()]
@@ -615,5 +725,136 @@ class TextParsingTest(unittest.TestCase):
         command_history = [command]
         assert_command_history_matches_that_for_text(self, command_history, text)
 
+ENGINE_COMPARISON_TEXTS = [
+    "!.?", "\n", "test{this$.", "test?", "testz", "ztest{", "test_this_even_more_z", "thisATest", "This_Is_A_Test",
+    "What of Home, New York", "is this, another test!?", "def compute_total_text(self):\n\treturn self.text[:-1]\n",
+    "word" + "," * 40, "chickenchickenchickenchickenchicken", "x = SOME_LONG_CONSTANT_NAME + someValue",
+]
+
+class SegmentingEngineTest(unittest.TestCase):
+    def test_compatibility_mode_matches_greedy_engine(self):
+        for text in ENGINE_COMPARISON_TEXTS:
+            expected_history = create_command_history_list_from_text(text)
+            actual_history = create_command_history_list_from_text(text, ParsingEngine.COMPATIBLE_SEGMENTING)
+            assert_command_histories_match(self, actual_history, expected_history)
+
+    def test_compatibility_mode_bounds_candidate_length(self):
+        numbers_of_evaluations = []
+        for number_of_commas in [500, 2000]:
+            text = "word" + "," * number_of_commas
+            command_history = []
+            parser = SegmentingTextParser(command_history.append, is_compatibility_mode=True)
+            parser.generate_command_history_for_text(text)
+            assert_command_histories_match(self, command_history, create_command_history_list_from_text(text))
+            numbers_of_evaluations.append(parser.get_matcher_evaluation_statistics().get_number_of_evaluations())
+        self.assertEqual(numbers_of_evaluations[0], numbers_of_evaluations[1])
+
+    def test_handles_prose(self):
+        text = "this is a test"
+        actual_history = create_command_history_list_from_text(text, ParsingEngine.SEGMENTING)
+        assert_command_histories_match(self, actual_history, [create_insert_command("phrase this is a test", text)])
+
+    def test_covers_all_text_with_fewest_commands(self):
+        text = "testz!"
+        expected_history = [create_type_word_test_command(), create_z_command(), create_bang_command()]
+        actual_history = create_command_history_list_from_text(text, ParsingEngine.SEGMENTING)
+        assert_command_histories_match(self, actual_history, expected_history)
+
+    def test_handles_empty_text(self):
+        self.assertEqual(create_command_history_list_from_text("", ParsingEngine.SEGMENTING), [])
+        self.assertEqual(create_command_history_list_from_text("", ParsingEngine.COMPATIBLE_SEGMENTING), [])
+
+class CommandCreationTest(unittest.TestCase):
+    def test_changing_single_character_commands_does_not_change_later_ones(self):
+        pattern_matcher = create_symbol_pattern_matcher()
+        command = create_command_from_pattern_matcher(pattern_matcher, "!")
+        command.get_actions().append(BasicAction('key', ['z']))
+        command.get_actions()[0].get_arguments().append('z')
+        assert_commands_match(self, create_command_from_pattern_matcher(pattern_matcher, "!"), create_insert_command("bang", "!"))
+
+    def test_reuses_commands_for_the_same_text(self):
+        pattern_matcher = create_formatted_words_pattern_matcher()
+        first_command = create_command_from_pattern_matcher(pattern_matcher, "memoized_command_test")
+        number_of_hits = get_command_memo_statistics().get_number_of_hits()
+        first_command.get_actions().append(BasicAction('key', ['z']))
+        second_command = create_command_from_pattern_matcher(pattern_matcher, "memoized_command_test")
+        self.assertIsNot(first_command, second_command)
+        self.assertEqual(get_command_memo_statistics().get_number_of_hits(), number_of_hits + 1)
+        assert_commands_match(self, second_command, create_insert_command("snake memoized command test", "memoized_command_test"))
+
+class CharacterRunTest(unittest.TestCase):
+    def test_splits_text_into_runs_of_each_class(self):
+        runs = split_text_into_character_runs("some_text  ==\n\n\t1")
+        actual_runs = [(run.get_character_class(), run.get_starting_index(), run.get_ending_index()) for run in runs]
+        expected_runs = [
+            (CharacterClass.ALPHABETIC, 0, 4),
+            (CharacterClass.SYMBOLS, 4, 5),
+            (CharacterClass.ALPHABETIC, 5, 9),
+            (CharacterClass.WHITESPACE, 9, 11),
+            (CharacterClass.SYMBOLS, 11, 13),
+            (CharacterClass.NEW_LINE, 13, 15),
+            (CharacterClass.TAB, 15, 16),
+            (CharacterClass.SYMBOLS, 16, 17),
+        ]
+        self.assertEqual(actual_runs, expected_runs)
+
+    def test_single_characters_skip_matcher_evaluations(self):
+        command_history = []
+        parser = TextParser(command_history.append)
+        parser.generate_command_history_for_text("\n!")
+        assert_command_histories_match(self, command_history, [create_enter_command(), create_bang_command()])
+        self.assertEqual(parser.get_matcher_evaluation_statistics().get_number_of_evaluations(), 0)
+
+class ParallelParsingTest(unittest.TestCase):
+    def test_chunks_end_after_new_lines(self):
+        text = "this is a test\nsome_words\n\nTestCase"
+        chunks = split_text_into_independent_chunks(text, 3)
+        self.assertEqual("".join(chunks), text)
+        self.assertGreater(len(chunks), 1)
+        for chunk in chunks[:-1]:
+            self.assertTrue(chunk.endswith("\n"))
+
+    def test_matches_serial_history(self):
+        text = "\n".join(ENGINE_COMPARISON_TEXTS)
+        for engine in ParsingEngine:
+            expected_history = create_command_history_list_from_text(text, engine)
+            actual_history = create_command_history_list_from_text_in_parallel(text, 2, engine)
+            assert_command_histories_match(self, actual_history, expected_history)
+
+class StreamingParsingTest(unittest.TestCase):
+    def test_matches_history_for_whole_text(self):
+        text = "\n".join(ENGINE_COMPARISON_TEXTS)
+        expected_history = create_command_history_list_from_text(text)
+        for chunk_size in [1, 2, 5, 64]:
+            chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+            actual_history = list(generate_commands_from_text_chunks(chunks))
+            assert_command_histories_match(self, actual_history, expected_history)
+
+    def test_yields_commands_before_the_text_ends(self):
+        def generate_chunks():
+            yield "test\nnext"
+            raise AssertionError("The first command should be available before the next chunk is read")
+        commands = generate_commands_from_text_chunks(generate_chunks())
+        assert_commands_match(self, next(commands), create_type_word_test_command())
+
+class MatcherEvaluationReuseTest(unittest.TestCase):
+    def _parse_and_get_statistics(self, text: str):
+        command_history = []
+        parser = TextParser(command_history.append)
+        parser.generate_command_history_for_text(text)
+        return command_history, parser.get_matcher_evaluation_statistics()
+
+    def test_reuses_answers_without_changing_output(self):
+        text = "testz"
+        command_history, statistics = self._parse_and_get_statistics(text)
+        assert_command_histories_match(self, command_history, [create_type_word_test_command(), create_z_command()])
+        self.assertGreater(statistics.get_number_of_reused_evaluations(), 0)
+
+    def test_backtracking_reuses_answers_for_previous_character(self):
+        _, statistics_with_backtracking = self._parse_and_get_statistics("testz")
+        _, statistics_without_backtracking = self._parse_and_get_statistics("test")
+        self.assertGreaterEqual(statistics_with_backtracking.get_number_of_reused_evaluations(), 
+                                statistics_without_backtracking.get_number_of_reused_evaluations() + 2)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
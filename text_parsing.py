@@ -1,45 +1,63 @@
 from action_records import Command
-from typing import Callable, List
-from patterns import PatternMatcher, create_new_line_pattern_matcher, create_symbol_pattern_matcher, create_command_from_pattern_matcher, \
+from typing import Callable, Iterable, Iterator, List
+from enum import Enum
+import itertools
+import re
+from patterns import PatternMatcher, SingleCharacterPatternMatcher, create_new_line_pattern_matcher, create_symbol_pattern_matcher, create_command_from_pattern_matcher, \
     create_word_pattern_matcher, create_formatted_words_pattern_matcher, create_formatted_word_pattern_matcher, \
     create_prose_pattern_matcher, create_tab_pattern_matcher
 
 class CurrentText:
-    def __init__(self):
-        self.text = ""
-        self.next_character = ""
+    """Tracks the text being matched as a span of the source text.
+        The text before the next character runs from the starting index up to the index,
+        and the next character is at the index. Substrings are only created when requested.
+    """
+    def __init__(self, source_text: str = ""):
+        self.source_text = source_text
+        self.starting_index = 0
         self.index = -1
         self.is_current_text_at_end_of_text = False
-    
-    def append_character(self, character: str):
-        if self.next_character: self.text += self.next_character
-        self.next_character = character
+        self.text = None
+
+    def set_source_text(self, source_text: str):
+        self.source_text = source_text
+        self.text = None
+
+    def append_next_character(self):
         self.index += 1
+        self.text = None
     
     def remove_last_character(self):
-        self.next_character = self.text[-1]
-        self.text = self.text[:-1]
         self.index -= 1
+        self.text = None
 
     def reset_text_information(self):
-        self.text = ""
-        self.next_character = ""
+        self.starting_index = self.index + 1
+        self.text = None
         
     def get_text(self):
+        if self.text is None:
+            self.text = self.source_text[self.starting_index:self.index]
         return self.text
 
     def get_next_character(self):
-        return self.next_character
+        if self.starting_index > self.index:
+            return ""
+        return self.source_text[self.index]
     
     def compute_total_text(self):
-        return self.text + self.next_character
+        return self.source_text[self.starting_index:self.index + 1]
     
     def set_index(self, index):
         self.index = index
+        self.text = None
 
     def get_index(self):
         return self.index
 
+    def get_starting_index(self):
+        return self.starting_index
+
     def is_at_the_end_of_the_text(self):
         return self.is_current_text_at_end_of_text
 
@@ -53,13 +71,13 @@ class CurrentText:
         return self.__str__()
     
     def __str__(self):
-        return f"CurrentText(text: {self.text}, next_character: {self.next_character})"
+        return f"CurrentText(text: {self.get_text()}, next_character: {self.get_next_character()})"
     
     def clone(self):
-        current_text = CurrentText()
-        current_text.text = self.text
-        current_text.next_character = self.next_character
+        current_text = CurrentText(self.source_text)
+        current_text.starting_index = self.starting_index
         current_text.index = self.index
+        current_text.text = self.text
         return current_text
 
 class Match:
@@ -83,20 +101,52 @@ class Match:
         return self.pattern.get_name() == other.pattern.get_name() and \
             self.text_information.get_index() == other.text_information.get_index()
 
-class PatternManager:
+def create_pattern_matchers() -> List[PatternMatcher]:
+    return [
+        create_new_line_pattern_matcher(),
+        create_tab_pattern_matcher(),
+        create_symbol_pattern_matcher(),
+        create_word_pattern_matcher(),
+        create_formatted_words_pattern_matcher(),
+        create_prose_pattern_matcher(),
+        create_formatted_word_pattern_matcher(),
+    ]
+
+def create_command_from_match(match: Match) -> Command:
+    text_information = match.get_text_information()
+    return create_command_from_pattern_matcher(match.get_pattern(), text_information.compute_total_text())
+
+class MatcherEvaluationStatistics:
+    """Counts how often pattern matchers were asked about the text and how many of those answers were reused instead"""
     def __init__(self):
-        self.patterns: List[PatternMatcher] = [
-            create_new_line_pattern_matcher(),
-            create_tab_pattern_matcher(),
-            create_symbol_pattern_matcher(),
-            create_word_pattern_matcher(),
-            create_formatted_words_pattern_matcher(),
-            create_prose_pattern_matcher(),
-            create_formatted_word_pattern_matcher(),
-        ]
+        self.number_of_evaluations = 0
+        self.number_of_reused_evaluations = 0
+
+    def get_number_of_evaluations(self) -> int:
+        return self.number_of_evaluations
+
+    def get_number_of_reused_evaluations(self) -> int:
+        return self.number_of_reused_evaluations
+
+    def __str__(self):
+        total = self.number_of_evaluations + self.number_of_reused_evaluations
+        return f"{self.number_of_evaluations} matcher calls made, {self.number_of_reused_evaluations} of {total} answers reused"
+
+#The answers for the current character and the one before it are kept so that backtracking by a character can reuse them
+NUMBER_OF_STEPS_TO_REMEMBER_EVALUATIONS_FOR = 2
+
+class PatternManager:
+    def __init__(self, patterns: List[PatternMatcher] = None, statistics: MatcherEvaluationStatistics = None):
+        if patterns is None:
+            patterns = create_pattern_matchers()
+        if statistics is None:
+            statistics = MatcherEvaluationStatistics()
+        self.patterns: List[PatternMatcher] = patterns
+        self.statistics = statistics
         self.matching_pattern = None
         self.patterns_that_could_match = None
         self.last_match: Match = None
+        self.step_evaluations = {}
         self.reset_matching_information()
     
     def has_match(self) -> bool:
@@ -109,24 +159,56 @@ class PatternManager:
         return self.last_match
     
     def get_command_from_pattern(self, text_information: CurrentText) -> Command:
-        pattern = self.last_match.get_pattern()
-        text_information = self.last_match.get_text_information()
-        command = create_command_from_pattern_matcher(pattern, text_information.compute_total_text())
-        return command
+        return create_command_from_match(self.last_match)
+
+    def _get_evaluations_for_step(self, text_information: CurrentText) -> dict:
+        step = (text_information.get_starting_index(), text_information.get_index())
+        evaluations = self.step_evaluations.get(step)
+        if evaluations is None:
+            evaluations = {}
+            self.step_evaluations[step] = evaluations
+            if len(self.step_evaluations) > NUMBER_OF_STEPS_TO_REMEMBER_EVALUATIONS_FOR:
+                oldest_step = next(iter(self.step_evaluations))
+                del self.step_evaluations[oldest_step]
+        return evaluations
+
+    def _does_pattern_belong(self, pattern: PatternMatcher, evaluations: dict, text: str, next_character: str) -> bool:
+        key = pattern.get_name()
+        outcome = evaluations.get(key)
+        if outcome is None:
+            outcome = pattern.does_belong_to_pattern(text, next_character)
+            evaluations[key] = outcome
+            self.statistics.number_of_evaluations += 1
+        else:
+            self.statistics.number_of_reused_evaluations += 1
+        return outcome
+
+    def _could_pattern_potentially_belong(self, pattern: PatternMatcher, evaluations: dict, text: str, next_character: str, is_end_of_text: bool) -> bool:
+        key = (pattern.get_name(), is_end_of_text)
+        outcome = evaluations.get(key)
+        if outcome is None:
+            outcome = bool(pattern.could_potentially_belong_to_pattern(text, next_character, is_end_of_text))
+            evaluations[key] = outcome
+            self.statistics.number_of_evaluations += 1
+        else:
+            self.statistics.number_of_reused_evaluations += 1
+        return outcome
 
     def handle_text_information(self, text_information: CurrentText):
         text = text_information.get_text()
         next_character = text_information.get_next_character()
+        is_end_of_text = text_information.is_at_the_end_of_the_text()
+        evaluations = self._get_evaluations_for_step(text_information)
         if not self.patterns_that_could_match:
             self.patterns_that_could_match = {pattern.get_name(): pattern 
                                                                  for pattern in self.patterns 
-                                                                 if pattern.could_potentially_belong_to_pattern(text, next_character)}
+                                                                 if self._could_pattern_potentially_belong(pattern, evaluations, text, next_character, False)}
         for name, pattern in self.patterns_that_could_match.copy().items():
-            if pattern.does_belong_to_pattern(text, next_character):
+            if self._does_pattern_belong(pattern, evaluations, text, next_character):
                 self.last_match = Match(pattern, text_information.clone())
                 self.matching_pattern = pattern
                 return
-            elif not pattern.could_potentially_belong_to_pattern(text, next_character, text_information.is_at_the_end_of_the_text()):
+            elif not self._could_pattern_potentially_belong(pattern, evaluations, text, next_character, is_end_of_text):
                 self.patterns_that_could_match.pop(name)
         self.matching_pattern = None
     
@@ -134,8 +216,9 @@ class PatternManager:
         text = text_information.get_text()
         next_character = text_information.get_next_character()
         is_end_of_text = text_information.is_at_the_end_of_the_text()
+        evaluations = self._get_evaluations_for_step(text_information)
         for pattern in self.patterns_that_could_match.values():
-            if pattern.could_potentially_belong_to_pattern(text, next_character, is_end_of_text):
+            if self._could_pattern_potentially_belong(pattern, evaluations, text, next_character, is_end_of_text):
                 return False
         return True
     
@@ -143,66 +226,463 @@ class PatternManager:
         self.matching_pattern = None
         self.patterns_that_could_match = None
         self.last_match = None
+        self.step_evaluations = {}
 
     def handle_match(self):
         self.reset_matching_information()
 
+class CandidateScan:
+    """Applies the matching rules to the text starting at a single index one character at a time.
+        Once the scan finishes, it provides the match to turn into a command, if any,
+        and the index the next scan should start at.
+    """
+    def __init__(self, text: str, starting_index: int, patterns: List[PatternMatcher], statistics: MatcherEvaluationStatistics = None):
+        self.text_information = CurrentText(text)
+        self.text_information.set_index(starting_index - 1)
+        self.text_information.reset_text_information()
+        self.pattern_manager = PatternManager(patterns, statistics)
+        self.match_found = False
+        self.is_scan_finished = False
+        self.match: Match = None
+        self.next_starting_index = None
+
+    def handle_next_character(self, is_end_of_text: bool):
+        self.text_information.append_next_character()
+        if is_end_of_text:
+            self.text_information.acknowledge_that_the_end_of_the_text_has_been_reached()
+        self.pattern_manager.handle_text_information(self.text_information)
+        no_pattern_could_potentially_match = self.pattern_manager.no_pattern_could_potentially_match(self.text_information)
+        if self.pattern_manager.has_match():
+            self.match_found = True
+        elif self.match_found and no_pattern_could_potentially_match:
+            self.text_information.remove_last_character()
+            self.pattern_manager.handle_text_information(self.text_information)
+            self._finish_with_last_match()
+        elif no_pattern_could_potentially_match:
+            self._finish_without_match()
+        if is_end_of_text and not self.is_scan_finished:
+            if self.pattern_manager.has_match():
+                self._finish_with_last_match()
+            else:
+                self._finish_without_match()
+
+    def finish(self):
+        """Ends the scan after the characters handled so far, as if no pattern could match more of them"""
+        if self.match_found:
+            self._finish_with_last_match()
+        else:
+            self._finish_without_match()
+
+    def _finish_with_last_match(self):
+        self.match = self.pattern_manager.get_last_match()
+        self.next_starting_index = self.match.get_text_information().get_index() + 1
+        self.is_scan_finished = True
+
+    def _finish_without_match(self):
+        self.next_starting_index = self.text_information.get_index() + 1
+        self.is_scan_finished = True
+
+    def set_source_text(self, text: str):
+        """Replaces the text being scanned with one that starts with the same characters"""
+        self.text_information.set_source_text(text)
+
+    def get_starting_index(self) -> int:
+        return self.text_information.get_starting_index()
+
+    def get_index(self) -> int:
+        return self.text_information.get_index()
+
+    def is_finished(self) -> bool:
+        return self.is_scan_finished
+
+    def has_match(self) -> bool:
+        return self.match is not None
+
+    def get_match(self) -> Match:
+        return self.match
+
+    def get_current_match(self) -> Match:
+        """Returns the match found by the last character handled, if any"""
+        if self.is_scan_finished:
+            return self.match
+        if self.pattern_manager.has_match():
+            return self.pattern_manager.get_last_match()
+        return None
+
+    def get_next_starting_index(self) -> int:
+        return self.next_starting_index
+
+    def compute_next_starting_index_after_last_match(self) -> int:
+        """Returns the index after the last match found so far, which is where the next scan starts if the scan finishes with that match"""
+        if not self.match_found:
+            return None
+        return self.pattern_manager.get_last_match().get_text_information().get_index() + 1
+
+class CharacterClass(Enum):
+    NEW_LINE = 1
+    TAB = 2
+    WHITESPACE = 3
+    ALPHABETIC = 4
+    SYMBOLS = 5
+
+CHARACTER_RUN_REGEX = re.compile(
+    r"(?P<NEW_LINE>\n+)"
+    r"|(?P<TAB>\t+)"
+    r"|(?P<WHITESPACE>[^\S\n\t]+)"
+    r"|(?P<ALPHABETIC>[^\W\d_]+)"
+    r"|(?P<SYMBOLS>(?:(?!\s)[\W\d_])+)"
+)
+
+class CharacterRun:
+    def __init__(self, character_class: CharacterClass, starting_index: int, ending_index: int):
+        self.character_class = character_class
+        self.starting_index = starting_index
+        self.ending_index = ending_index
+
+    def get_character_class(self) -> CharacterClass:
+        return self.character_class
+
+    def get_starting_index(self) -> int:
+        return self.starting_index
+
+    def get_ending_index(self) -> int:
+        return self.ending_index
+
+    def __repr__(self):
+        return f"CharacterRun({self.character_class.name}, {self.starting_index}, {self.ending_index})"
+
+def split_text_into_character_runs(text: str, starting_index: int = 0) -> List[CharacterRun]:
+    return [CharacterRun(CharacterClass[run.lastgroup], run.start(), run.end()) for run in CHARACTER_RUN_REGEX.finditer(text, starting_index)]
+
+def find_alphabetic_characters(text: str) -> bytearray:
+    """Returns a flag for every character of the text that is set when the character belongs to an alphabetic character run"""
+    is_alphabetic = bytearray(len(text))
+    for run in CHARACTER_RUN_REGEX.finditer(text):
+        if run.lastgroup == CharacterClass.ALPHABETIC.name:
+            is_alphabetic[run.start():run.end()] = b'\x01'*(run.end() - run.start())
+    return is_alphabetic
+
+def find_single_character_pattern(single_character_patterns: List[PatternMatcher], character: str) -> PatternMatcher:
+    for pattern in single_character_patterns:
+        if pattern.does_belong_to_pattern("", character):
+            return pattern
+    return None
+
+MINIMUM_LENGTH_OF_PARSED_TEXT_TO_DISCARD = 1 << 16
+
 class TextParser:
-    """Generates an artificial command history that could have created all or most of the input text."""
+    """Generates an artificial command history that could have created all or most of the input text.
+        Only pattern matchers for single characters can accept a character that is not alphabetic at the start of a candidate,
+        so the text is split into character runs first and candidates are only scanned character by character from alphabetic runs.
+    """
     def __init__(self, on_command_creation: Callable[[Command], None]):
         self.on_command_creation = on_command_creation
-        self.text_information = CurrentText()
-        self.pattern_manager = PatternManager()
+        self.patterns = create_pattern_matchers()
+        self.single_character_patterns = [pattern for pattern in self.patterns if isinstance(pattern, SingleCharacterPatternMatcher)]
+        self.characters_to_single_character_patterns = {}
+        self.statistics = MatcherEvaluationStatistics()
+        self.text = ""
         self.index = 0
+        self.candidate_scan: CandidateScan = None
 
-    def backtrack(self):
-        last_match = self.pattern_manager.get_last_match()
-        self.index = last_match.get_text_information().get_index()
-        self.text_information.set_index(self.index)
-        self.text_information.handle_backtracking_before_end_of_text()
+    def get_matcher_evaluation_statistics(self) -> MatcherEvaluationStatistics:
+        return self.statistics
 
-    def handle_match(self):
-        command = self.pattern_manager.get_command_from_pattern(self.text_information)
+    def handle_match(self, match: Match):
+        command = create_command_from_match(match)
         self.on_command_creation(command)
-        if self.pattern_manager.had_intermediate_match():
-            self.backtrack()
-        else:
-            self.index - 1
-        self.reset_text_information()
-        self.pattern_manager.handle_match()
-        
-    def reset_text_information(self):
-        self.text_information.reset_text_information()
+
+    def _get_single_character_pattern(self, character: str) -> PatternMatcher:
+        if character not in self.characters_to_single_character_patterns:
+            self.characters_to_single_character_patterns[character] = find_single_character_pattern(self.single_character_patterns, character)
+        return self.characters_to_single_character_patterns[character]
+
+    def _handle_single_characters(self, text: str, ending_index: int):
+        while self.index < ending_index:
+            character = text[self.index]
+            pattern = self._get_single_character_pattern(character)
+            if pattern is not None:
+                self.on_command_creation(create_command_from_pattern_matcher(pattern, character))
+            self.index += 1
 
     def generate_command_history_for_text(self, text: str):
-        match_found = False
-        found_match_to_process = False
-        while self.index < len(text):
-            self.text_information.append_character(text[self.index])
-            if self.index == len(text) - 1:
-                self.text_information.acknowledge_that_the_end_of_the_text_has_been_reached()
-            self.pattern_manager.handle_text_information(self.text_information)
-            no_pattern_could_potentially_match = self.pattern_manager.no_pattern_could_potentially_match(self.text_information)
-            if self.pattern_manager.has_match():
-                match_found = True
-            elif match_found and no_pattern_could_potentially_match:
-                found_match_to_process = True
-            elif no_pattern_could_potentially_match:
-                self.reset_text_information()
-            if found_match_to_process:
-                self.text_information.remove_last_character()
-                self.pattern_manager.handle_text_information(self.text_information)
-                self.handle_match()
-                found_match_to_process = False
-                match_found = False
+        self.handle_text_chunk(text)
+        self.finish_text()
+
+    def handle_text_chunk(self, chunk: str):
+        """Adds the chunk to the end of the text and parses as much of the text as possible without knowing where it ends.
+            The last character is held back until more text arrives or the text is finished,
+            and a candidate that has not finished yet carries over into the next chunk.
+        """
+        self.text += chunk
+        if self.candidate_scan is not None:
+            self.candidate_scan.set_source_text(self.text)
+        self._parse_text(has_reached_end_of_text=False)
+
+    def finish_text(self):
+        self._parse_text(has_reached_end_of_text=True)
+        self.text = ""
+        self.index = 0
+
+    def _discard_parsed_text(self):
+        self.text = self.text[self.index:]
+        self.index = 0
+
+    def _parse_text(self, has_reached_end_of_text: bool):
+        parsable_length = len(self.text) if has_reached_end_of_text else len(self.text) - 1
+        #The text before the current candidate was already parsed, so it does not need to be split into runs again
+        unparsed_text_start = self.index if self.candidate_scan is None else self.candidate_scan.get_starting_index()
+        character_runs = split_text_into_character_runs(self.text, unparsed_text_start)
+        run_index = 0
+        while self.index < parsable_length:
+            if self.candidate_scan is None:
+                #Only discarding once at least half of the text is parsed keeps the copying linear in the length of the text
+                if self.index >= MINIMUM_LENGTH_OF_PARSED_TEXT_TO_DISCARD and self.index*2 >= len(self.text):
+                    parsable_length -= self.index
+                    self._discard_parsed_text()
+                    character_runs = split_text_into_character_runs(self.text)
+                    run_index = 0
+                while character_runs[run_index].get_ending_index() <= self.index:
+                    run_index += 1
+                character_run = character_runs[run_index]
+                if character_run.get_character_class() != CharacterClass.ALPHABETIC:
+                    self._handle_single_characters(self.text, min(character_run.get_ending_index(), parsable_length))
+                    continue
+                self.candidate_scan = CandidateScan(self.text, self.index, self.patterns, self.statistics)
+            self.candidate_scan.handle_next_character(has_reached_end_of_text and self.index == len(self.text) - 1)
             self.index += 1
-        if self.pattern_manager.has_match():
-            self.handle_match()
-            
-def create_command_history_list_from_text(text: str):
-    command_history = []
+            if self.candidate_scan.is_finished():
+                if self.candidate_scan.has_match():
+                    self.handle_match(self.candidate_scan.get_match())
+                self.index = self.candidate_scan.get_next_starting_index()
+                self.candidate_scan = None
+
+def generate_commands_from_text_chunks(text_chunks: Iterable[str]) -> Iterator[Command]:
+    """Yields the commands for the text made up of the chunks as soon as they are created"""
+    commands = []
+    text_parser = TextParser(commands.append)
+    for chunk in text_chunks:
+        text_parser.handle_text_chunk(chunk)
+        yield from commands
+        commands.clear()
+    text_parser.finish_text()
+    yield from commands
+
+#Long enough for the longest prose or formatted words utterance
+MAXIMUM_CANDIDATE_LENGTH = 256
+#Most candidates match again within a few characters, so scanning after a match only starts once that many characters have passed without another
+NUMBER_OF_CHARACTERS_TO_WAIT_FOR_ANOTHER_MATCH = 4
+
+class SegmentingTextParser:
+    """Generates a command history by running candidate scans together in one pass over the text
+        and choosing the segmentation of the text into commands from their matches.
+        Like in TextParser, only characters in alphabetic character runs start candidate scans and every other character is a candidate by itself.
+        Candidates are limited to MAXIMUM_CANDIDATE_LENGTH characters, which bounds the work per character.
+        In compatibility mode the segmentation follows the same choices as TextParser, so the output is identical
+        as long as no candidate reaches that length. Otherwise a Viterbi style pass picks the segmentation
+        that leaves the fewest characters uncovered using the fewest commands. That needs a scan from every alphabetic character,
+        which makes it several times slower than TextParser on ordinary source files.
+    """
+    def __init__(self, on_command_creation: Callable[[Command], None], is_compatibility_mode: bool = False):
+        self.on_command_creation = on_command_creation
+        self.is_compatibility_mode = is_compatibility_mode
+        self.patterns = create_pattern_matchers()
+        self.single_character_patterns = [pattern for pattern in self.patterns if isinstance(pattern, SingleCharacterPatternMatcher)]
+        self.characters_to_single_character_patterns = {}
+        self.statistics = MatcherEvaluationStatistics()
+
+    def get_matcher_evaluation_statistics(self) -> MatcherEvaluationStatistics:
+        return self.statistics
+
+    def _get_single_character_pattern(self, character: str) -> PatternMatcher:
+        if character not in self.characters_to_single_character_patterns:
+            self.characters_to_single_character_patterns[character] = find_single_character_pattern(self.single_character_patterns, character)
+        return self.characters_to_single_character_patterns[character]
+
+    def _create_single_character_command(self, character: str) -> Command:
+        pattern = self._get_single_character_pattern(character)
+        if pattern is None:
+            return None
+        return create_command_from_pattern_matcher(pattern, character)
+
+    def generate_command_history_for_text(self, text: str):
+        if self.is_compatibility_mode:
+            self._generate_command_history_like_text_parser(text)
+        else:
+            self._generate_command_history_with_fewest_commands(text)
+
+    def _create_chain_entry(self, text: str, index: int, is_alphabetic: bytearray):
+        if is_alphabetic[index]:
+            return CandidateScan(text, index, self.patterns, self.statistics)
+        return (index, index + 1)
+
+    def _get_chain_entry_starting_index(self, entry) -> int:
+        if type(entry) == tuple:
+            return entry[0]
+        return entry.get_starting_index()
+
+    def _generate_command_history_like_text_parser(self, text: str):
+        """Follows TextParser without going back to the end of the last match every time a candidate finishes.
+            TextParser starts its next candidate after the last match of the current one. Once the scan for a candidate has gone
+            NUMBER_OF_CHARACTERS_TO_WAIT_FOR_ANOTHER_MATCH characters past its last match, the scan starting after that match catches up
+            and runs alongside it until another match replaces it, so at most that many characters get scanned again per match.
+            The scans form a chain that starts at the candidate TextParser is on. Every character outside of alphabetic runs
+            is a chain entry holding its index and the index after it.
+        """
+        is_alphabetic = find_alphabetic_characters(text)
+        chain = []
+        #The index TextParser would start its next candidate at, which is the starting index of the first chain entry
+        starting_index = 0
+        for index in range(len(text)):
+            if not chain:
+                chain.append(self._create_chain_entry(text, starting_index, is_alphabetic))
+            chain_index = 0
+            while chain_index < len(chain):
+                entry = chain[chain_index]
+                if type(entry) == tuple:
+                    next_entry_starting_index = entry[1]
+                else:
+                    if entry.get_index() < index:
+                        self._scan_up_to_index(entry, text, index)
+                    next_entry_starting_index = entry.get_next_starting_index() if entry.is_finished() else entry.compute_next_starting_index_after_last_match()
+                chain_index += 1
+                if chain_index < len(chain):
+                    if self._get_chain_entry_starting_index(chain[chain_index]) != next_entry_starting_index:
+                        del chain[chain_index:]
+                elif next_entry_starting_index is not None and next_entry_starting_index <= index and \
+                    (type(entry) == tuple or entry.is_finished() or next_entry_starting_index + NUMBER_OF_CHARACTERS_TO_WAIT_FOR_ANOTHER_MATCH <= index):
+                    chain.append(self._create_chain_entry(text, next_entry_starting_index, is_alphabetic))
+            while chain and (type(chain[0]) == tuple or chain[0].is_finished()):
+                entry = chain.pop(0)
+                if type(entry) == tuple:
+                    command = self._create_single_character_command(text[entry[0]])
+                    starting_index = entry[1]
+                else:
+                    command = create_command_from_match(entry.get_match()) if entry.has_match() else None
+                    starting_index = entry.get_next_starting_index()
+                if command is not None:
+                    self.on_command_creation(command)
+
+    def _scan_up_to_index(self, scan: CandidateScan, text: str, index: int):
+        while not scan.is_finished() and scan.get_index() < index:
+            next_index = scan.get_index() + 1
+            scan.handle_next_character(next_index == len(text) - 1)
+            if not scan.is_finished() and next_index - scan.get_starting_index() + 1 >= MAXIMUM_CANDIDATE_LENGTH:
+                scan.finish()
+
+    def _generate_command_history_with_fewest_commands(self, text: str):
+        is_alphabetic = find_alphabetic_characters(text)
+        #best_costs[i] holds the number of uncovered characters and the number of commands for the best segmentation of text[:i]
+        best_costs = [None]*(len(text) + 1)
+        best_costs[0] = (0, 0)
+        #A final match is a Match for a candidate scan and the starting index for a single character command
+        best_final_matches = [None]*(len(text) + 1)
+        def consider_match(match, starting_index: int, ending_index: int):
+            starting_cost = best_costs[starting_index]
+            cost = (starting_cost[0], starting_cost[1] + 1)
+            current_cost = best_costs[ending_index]
+            if current_cost is None or cost < current_cost or \
+                (cost == current_cost and best_final_matches[ending_index] is not None and \
+                    starting_index < self._get_final_match_starting_index(best_final_matches[ending_index])):
+                best_costs[ending_index] = cost
+                best_final_matches[ending_index] = match
+        def consider_current_match(scan: CandidateScan):
+            current_match = scan.get_current_match()
+            if current_match is not None:
+                text_information = current_match.get_text_information()
+                consider_match(current_match, text_information.get_starting_index(), text_information.get_index() + 1)
+        active_scans: List[CandidateScan] = []
+        for index in range(len(text)):
+            is_end_of_text = index == len(text) - 1
+            for scan in active_scans:
+                scan.handle_next_character(is_end_of_text)
+                consider_current_match(scan)
+            skipping_cost = (best_costs[index][0] + 1, best_costs[index][1])
+            if best_costs[index + 1] is None or skipping_cost < best_costs[index + 1]:
+                best_costs[index + 1] = skipping_cost
+                best_final_matches[index + 1] = None
+            if is_alphabetic[index]:
+                new_scan = CandidateScan(text, index, self.patterns, self.statistics)
+                new_scan.handle_next_character(is_end_of_text)
+                consider_current_match(new_scan)
+                active_scans.append(new_scan)
+            elif self._get_single_character_pattern(text[index]) is not None:
+                consider_match(index, index, index + 1)
+            active_scans = [scan for scan in active_scans 
+                            if not scan.is_finished() and index - scan.get_starting_index() + 1 < MAXIMUM_CANDIDATE_LENGTH]
+        final_matches = []
+        index = len(text)
+        while index > 0:
+            final_match = best_final_matches[index]
+            if final_match is None:
+                index -= 1
+            else:
+                final_matches.append(final_match)
+                index = self._get_final_match_starting_index(final_match)
+        for final_match in reversed(final_matches):
+            if type(final_match) == int:
+                self.on_command_creation(self._create_single_character_command(text[final_match]))
+            else:
+                self.on_command_creation(create_command_from_match(final_match))
+
+    def _get_final_match_starting_index(self, final_match) -> int:
+        if type(final_match) == int:
+            return final_match
+        return final_match.get_text_information().get_starting_index()
+
+class ParsingEngine(Enum):
+    GREEDY = 1
+    SEGMENTING = 2
+    COMPATIBLE_SEGMENTING = 3
+
+def create_text_parser(on_command_creation: Callable[[Command], None], engine: ParsingEngine = ParsingEngine.GREEDY):
+    if engine == ParsingEngine.SEGMENTING:
+        return SegmentingTextParser(on_command_creation)
+    if engine == ParsingEngine.COMPATIBLE_SEGMENTING:
+        return SegmentingTextParser(on_command_creation, is_compatibility_mode=True)
+    return TextParser(on_command_creation)
+
+def create_command_history_list_from_text(text: str, engine: ParsingEngine = ParsingEngine.GREEDY, command_history = None):
+    """Returns the command history for the text in the given container, such as a CommandHistory, or in a new list if none is given"""
+    if command_history is None:
+        command_history = []
     def on_command_creation(command):
         command_history.append(command)
-    text_parser = TextParser(on_command_creation)
+    text_parser = create_text_parser(on_command_creation, engine)
     text_parser.generate_command_history_for_text(text)
-    return command_history
\ No newline at end of file
+    return command_history
+
+def split_text_into_independent_chunks(text: str, number_of_chunks: int) -> List[str]:
+    """Splits the text into about the given number of chunks, each ending right after a new line.
+        No pattern matcher can continue a candidate past a new line, so every parsing engine starts fresh after one
+        and the command histories for the chunks put together are the command history for the whole text.
+    """
+    chunks = []
+    target_chunk_length = max(1, len(text) // max(1, number_of_chunks))
+    starting_index = 0
+    while starting_index < len(text):
+        new_line_index = text.find('\n', starting_index + target_chunk_length - 1)
+        ending_index = len(text) if new_line_index == -1 else new_line_index + 1
+        chunks.append(text[starting_index:ending_index])
+        starting_index = ending_index
+    return chunks
+
+def _create_command_history_list_from_chunk(chunk: str, engine: ParsingEngine) -> List[Command]:
+    return create_command_history_list_from_text(chunk, engine)
+
+#More chunks than processes keeps every process busy when some chunks take longer than others
+NUMBER_OF_CHUNKS_PER_PROCESS = 4
+
+def create_command_history_list_from_text_in_parallel(text: str, number_of_processes: int, engine: ParsingEngine = ParsingEngine.GREEDY):
+    if number_of_processes <= 1:
+        return create_command_history_list_from_text(text, engine)
+    chunks = split_text_into_independent_chunks(text, number_of_processes*NUMBER_OF_CHUNKS_PER_PROCESS)
+    if len(chunks) <= 1:
+        return create_command_history_list_from_text(text, engine)
+    command_history = []
+    #Importing the process pool is slow, so only parsing in parallel pays for it
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(min(number_of_processes, len(chunks))) as executor:
+        for chunk_command_history in executor.map(_create_command_history_list_from_chunk, chunks, itertools.repeat(engine)):
+            command_history.extend(chunk_command_history)
+    return command_history